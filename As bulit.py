@@ -3,42 +3,20 @@ import shutil
 import tkinter as tk
 from tkinter import filedialog, messagebox
 import re
+from qc_schema import AS_BUILT_FOLDERS, AS_BUILT_SCHEMA, TARGET_FOLDER_PATTERNS, normalize_folder_name
 
 def rename_folders_and_remove_files(root_dir):
-    # 定義資料夾重新命名對照表
-    rename_map = {
-        "01 Welding Summary": "04 Welding Identification Summary",
-        "01 Welding Identification Summary": "04 Welding Identification Summary",
-        "02 Material Traceability & Mill Cert": "02 Material Traceability",
-        "03 Dimension Inspection Record": "07 Dimensional Reports",
-        "05 Drawings": "01 Workshop Drawings",
-        "05 Workshop Drawings": "01 Workshop Drawings",
-        "07 FAT report": "09 FAT reports (Incl. punch list)",
-        "07 FAT reports": "09 FAT reports (Incl. punch list)",
-        "Material certificates": "02 Material Traceability",
-        "Welding Consumable": "05 Welding Consumable",
-        "04 NDT Reports": "06 NDT Reports"
-    }
-
-    # 必要的資料夾列表
-    required_folders = [
-        "01 Workshop Drawings",
-        "02 Material Traceability",
-        "04 Welding Identification Summary",
-        "05 Welding Consumable",
-        "06 NDT Reports",
-        "07 Dimensional Reports",
-        "09 FAT reports (Incl. punch list)"
-    ]
+    # 資料夾重新命名對照（舊名稱與別名）與必要的資料夾列表統一定義在 qc_schema
+    required_folders = list(AS_BUILT_FOLDERS.values())
 
     # 指定需要重命名檔案的資料夾
     folders_to_rename_files = [
-        "02 Material Traceability",
-        "04 Welding Identification Summary"
+        AS_BUILT_FOLDERS['material'],
+        AS_BUILT_FOLDERS['welding_summary']
     ]
 
     # 正則表達式模式
-    pattern = re.compile(r'(XB1#|XB[1-4][ABC]#|6S21[1-7]#|6S20[12356]#|XB3B\.002#|XB4B\.002#)\d+', re.IGNORECASE)
+    pattern = TARGET_FOLDER_PATTERNS['as_built']
 
     def get_extension(filename):
         """取得檔案副檔名"""
@@ -48,7 +26,7 @@ def rename_folders_and_remove_files(root_dir):
         """修復被錯誤重命名的 04 Welding Identification Summary 檔案"""
         for root, dirs, files in os.walk(root_dir):
             # 只處理 04 Welding Identification Summary 資料夾
-            if os.path.basename(root) == "04 Welding Identification Summary":
+            if os.path.basename(root) == AS_BUILT_FOLDERS['welding_summary']:
                 for filename in files:
                     if "Welding Identification Summary_Welding Identification Summary" in filename:
                         # 移除重複的部分
@@ -69,7 +47,7 @@ def rename_folders_and_remove_files(root_dir):
         ext = get_extension(filename)
         basename = filename[:-len(ext)] if ext else filename
 
-        if folder == "02 Material Traceability":
+        if folder == AS_BUILT_FOLDERS['material']:
             # 移除 "Material Identification " 或 "Material Traceability " 這類字串
             basename = re.sub(r'^(?:Material Identification|Material Traceability)\s+', '', basename, flags=re.IGNORECASE)
             # 移除所有 "02 Material Traceability_" 前綴
@@ -146,14 +124,11 @@ def rename_folders_and_remove_files(root_dir):
         for old_name in os.listdir(dir_path):
             old_path = os.path.join(dir_path, old_name)
             if os.path.isdir(old_path):
-                new_name = old_name
-                lower_old_name = old_name.lower().replace(' ', '')
-                # 檢查重命名映射
-                for key in rename_map:
-                    key_normalized = key.lower().replace(' ', '')
-                    if lower_old_name == key_normalized:
-                        new_name = rename_map[key]
-                        break
+                # 以正規化名稱查表取得標準名稱，不屬於資料夾結構的資料夾保持不變；
+                # 與標準名稱只差大小寫或標點的資料夾也保持不變，避免在不分大小寫的檔案系統上與自身合併
+                new_name = AS_BUILT_SCHEMA.canonical_name(old_name) or old_name
+                if normalize_folder_name(new_name) == normalize_folder_name(old_name):
+                    new_name = old_name
                 if new_name != old_name:
                     new_path = os.path.join(dir_path, new_name)
                     try:
@@ -172,7 +147,7 @@ def rename_folders_and_remove_files(root_dir):
 
         # 處理特殊資料夾移動和刪除
         old_punch_path = os.path.join(dir_path, "08 Punch list")
-        new_punch_path = os.path.join(dir_path, "09 FAT reports (Incl. punch list)", "Punch list")
+        new_punch_path = os.path.join(dir_path, AS_BUILT_FOLDERS['fat_reports'], "Punch list")
         if os.path.exists(old_punch_path):
             os.makedirs(os.path.dirname(new_punch_path), exist_ok=True)
             try:
@@ -191,11 +166,11 @@ def rename_folders_and_remove_files(root_dir):
                 except Exception as e:
                     print(f"刪除資料夾時發生錯誤：{e}")
 
-        material_traceability_path = os.path.join(dir_path, "02 Material Traceability")
+        material_traceability_path = os.path.join(dir_path, AS_BUILT_FOLDERS['material'])
         if os.path.exists(material_traceability_path):
             welding_consumable_path = os.path.join(material_traceability_path, "Welding Consumable")
             if os.path.exists(welding_consumable_path):
-                new_welding_consumable_path = os.path.join(dir_path, "05 Welding Consumable")
+                new_welding_consumable_path = os.path.join(dir_path, AS_BUILT_FOLDERS['welding_consumable'])
                 if not os.path.exists(new_welding_consumable_path):
                     try:
                         shutil.move(welding_consumable_path, new_welding_consumable_path)
@@ -5,6 +5,7 @@ import logging
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
 from datetime import datetime
+from qc_schema import parse_target_folder
 
 class FolderCopyApp:
     def __init__(self):
@@ -391,10 +392,18 @@ class FolderCopyApp:
         os.makedirs(ljb_folder, exist_ok=True)
         os.makedirs(ujb_folder, exist_ok=True)
 
-        # 收集符合條件的資料夾
+        # 收集符合條件的資料夾：以 qc_schema 解析資料夾名稱的前綴與流水號後直接查表；
+        # 無法解析的名稱（例如使用者自行加入的前綴）仍以原本的方式比對映射中的名稱
+        wanted = {(folder_name, serial) for folder_name, serials in self.folder_mapping.items()
+                  for serial in serials}
         matched_folders = []
         for root, dirs, _ in os.walk(source_folder):
             for dir_name in dirs:
+                parsed = parse_target_folder(dir_name)
+                if parsed is not None:
+                    if parsed in wanted:
+                        matched_folders.append((root, dir_name))
+                    continue
                 for folder_name, serials in self.folder_mapping.items():
                     if any(f"{folder_name}#{serial}" in dir_name for serial in serials):
                         matched_folders.append((root, dir_name))
@@ -1,101 +1,1333 @@
 import os
 import shutil
+import hashlib
 import fitz  # PyMuPDF
 import tkinter as tk
 from tkinter import filedialog, messagebox
 import re
-from difflib import get_close_matches
 import json
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import sqlite3
+import time
+import mmap
+import tempfile
+from collections import defaultdict, deque, OrderedDict
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
 import threading
 import logging  # 導入 logging 模組
+import select
+import struct
+import sys
+import ctypes
+import ctypes.util
+import argparse
+import csv
+from contextlib import contextmanager, nullcontext
+from qc_schema import AS_BUILT_FOLDERS, GENERAL_FOLDERS, TARGET_FOLDER_PATTERNS, get_folder_schema
 
 # 設定日誌記錄
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 # 定義常數
-CACHE_FILE = 'file_cache.json'
-SUMMARY_FOLDER_NAME_AS_BUILT = "04 Welding Identification Summary"
-SUMMARY_FOLDER_NAME_GENERAL = "01 Welding Identification Summary"
-NDT_REPORTS_FOLDER_AS_BUILT = '06 NDT Reports'
-NDT_REPORTS_FOLDER_GENERAL = '04 NDT Reports'
-WELDING_CONSUMABLE_FOLDER_AS_BUILT = '05 Welding Consumable'
-WELDING_CONSUMABLE_FOLDER_GENERAL = os.path.join('02 Material Traceability & Mill Cert', 'Welding Consumable')
+CACHE_FILE = 'file_cache.db'
+CACHE_MAX_AGE_DAYS = 180  # 超過此天數未使用的快取紀錄將被清除
+PDF_EXTRACTION_WORKERS = os.cpu_count()  # PDF 文字擷取工作程序數量
+PDF_EXTRACTION_CHUNK_SIZE = 8  # 每個擷取工作包含的 PDF 數量
+RECONCILE_TARGET_FOLDERS = True  # True: 只複製新增或變更的檔案；False: 先刪除全部再重新複製
+MTIME_TOLERANCE_SECONDS = 2  # 網路磁碟與 FAT 的修改時間精度
+FOLDER_PIPELINE_WORKERS = 4  # 同時進行同步作業（網路 I/O）的目標資料夾數量
+# 內容定址證書存放區的資料夾路徑，None 表示停用。啟用後每份證書每次執行只從網路讀取一次，
+# 再以硬連結（無法建立時改為複製）放入各目標資料夾的 NDT Reports / Welding Consumable
+CERT_STORE_FOLDER = None
+COPY_BUFFER_SIZE = 1024 * 1024
+RUN_BUFFER_MAX_BYTES = 256 * 1024 * 1024  # 單次執行保留的來源檔案緩衝區總量上限（讀入記憶體與 mmap 對應的都計入）
+MMAP_THRESHOLD_BYTES = 32 * 1024 * 1024  # 超過此大小的檔案以 mmap 對應，不整份讀入記憶體
+# 本機鏡像資料夾路徑，None 表示停用。啟用後報驗單與焊材材證從本機鏡像讀取，只有變更的檔案才經由網路傳輸
+MIRROR_FOLDER = None
+MIRROR_MAX_BYTES = 20 * 1024 ** 3  # 本機鏡像容量上限，超過時依最近使用時間淘汰
+WATCH_POLL_SECONDS = 30  # 監看模式以輪詢檢查來源資料夾的間隔
+WATCH_SETTLE_SECONDS = 2  # 監看模式收到變動後再等待的秒數，讓同一批檔案一起處理
+NDT_INDEX_FILE = 'ndt_index.json'
+WELDING_INDEX_FILE = 'welding_index.json'
+REFERENCE_INDEX_FILE = 'reference_index.db'
+PACKAGE_INDEX_FILE = 'package_index.json'  # FAT package 目錄快照，供完整性稽核使用
+TEXT_INDEX_FILE = 'text_index.db'  # 銲道追溯 PDF 逐頁文字的全文檢索索引（SQLite FTS5）
+RUN_JOURNAL_FILE = 'run_journal.db'  # 記錄各目標資料夾已完成的處理階段，供中斷後以 --resume 接續
+# 銲道追溯資料夾名稱不符時的處理方式：prompt 詢問使用者；rename 將相似資料夾重新命名（找不到時建立）；
+# use_existing 直接使用相似資料夾（找不到時建立）；skip 略過該目標資料夾
+MISMATCH_POLICIES = ('prompt', 'rename', 'use_existing', 'skip')
+FOLDER_MISMATCH_POLICY = 'prompt'  # 預設的處理方式；無人值守時可改用 --mismatch-policy 指定其他方式，執行中不顯示對話框
+REPORT_FOLDER = 'reports'  # 執行報告（JSONL，每個動作一筆紀錄）存放的資料夾
+REPORT_WRITE_CSV = False  # True 時另外輸出相同內容的 CSV 報告
+REPORT_SAMPLE_SIZE = 5  # 完成對話框中每類項目最多列出的範例數
+SETTINGS_FILE = 'ndt_wm_settings.json'  # 記錄上次選擇的資料夾，供下次預設路徑與背景預熱使用
+# 子資料夾名稱統一定義在 qc_schema
+SUMMARY_FOLDER_NAME_AS_BUILT = AS_BUILT_FOLDERS['welding_summary']
+SUMMARY_FOLDER_NAME_GENERAL = GENERAL_FOLDERS['welding_summary']
+NDT_REPORTS_FOLDER_AS_BUILT = AS_BUILT_FOLDERS['ndt_reports']
+NDT_REPORTS_FOLDER_GENERAL = GENERAL_FOLDERS['ndt_reports']
+WELDING_CONSUMABLE_FOLDER_AS_BUILT = AS_BUILT_FOLDERS['welding_consumable']
+WELDING_CONSUMABLE_FOLDER_GENERAL = GENERAL_FOLDERS['welding_consumable']
 # 修改部分：竣工模式下的物料追溯應為 "02 Material Traceability"
-MATERIAL_TRACEABILITY_FOLDER_AS_BUILT = "02 Material Traceability"
-MATERIAL_TRACEABILITY_FOLDER_GENERAL = "02 Material Traceability & Mill Cert"
+MATERIAL_TRACEABILITY_FOLDER_AS_BUILT = AS_BUILT_FOLDERS['material']
+MATERIAL_TRACEABILITY_FOLDER_GENERAL = GENERAL_FOLDERS['material']
+MILL_CERT_SUBFOLDER = "Mill Cert"  # 物料追溯資料夾中存放鋼廠材證的子資料夾
+MILL_CERT_SOURCE_FOLDER = None  # 鋼廠材證來源資料夾，None 表示不收集鋼廠材證；另需啟用 MATERIAL_TABLE_LAYOUTS 中的爐號欄位版面
+MILL_CERT_INDEX_FILE = 'mill_cert_index.json'
 
 # 編譯常用的正則表達式，避免重複編譯
 RE_OLD_FILENAME_PATTERN = re.compile(r"CWP06G-XB4C")  # 更具體的命名
 RE_NDT_CODE = re.compile(r'CWPQRJKNDT(\d+)', re.IGNORECASE)
+RE_NDT_SOURCE_FILENAME = re.compile(r'CWP-Q-R-JK-NDT-(\d+)', re.IGNORECASE)
 RE_WELDING_CODE = re.compile(r'\b\d{6,10}\b')
-RE_TARGET_FOLDER = re.compile(r'XB1#\d+|XB[1-4][ABC]#\d+|6S21[1-7]#\d+|6S20[12356]#\d+', re.IGNORECASE)
-RE_BASE_FOLDER_NAME = re.compile(r'(XB1#\d+|XB[1-4][ABC]#\d+|6S21[1-7]#\d+|6S20[12356]#\d+)', re.IGNORECASE)
+RE_HEAT_NUMBER = re.compile(r'\b[A-Z]{0,3}\d{5,9}[A-Z]{0,2}\b')  # 物料追溯清單中的爐號（Heat No.），依鋼廠格式調整
+RE_FILENAME_TOKEN_SEPARATOR = re.compile(r'[^0-9A-Za-z]+')  # 鋼廠材證檔名中分隔字詞的字元，爐號只與完整字詞比對
+RE_TARGET_FOLDER = TARGET_FOLDER_PATTERNS['ndt_wm']
+
+RE_TRAILING_TOKEN = re.compile(r'\S*\Z')
+
+# 銲道追溯 PDF 需擷取的編號：快取鍵 -> 正則表達式，同一份 PDF 只開啟一次並套用全部設定
+PDF_CODE_PATTERNS = {
+    'ndt_codes': RE_NDT_CODE,
+    'welding_codes': RE_WELDING_CODE,
+}
+# 物料追溯清單 PDF 需擷取的編號
+MATERIAL_CODE_PATTERNS = {
+    'heat_numbers': RE_HEAT_NUMBER,
+}
+# 各文件類型擷取的編號設定
+PDF_DOC_TYPE_PATTERNS = {
+    'welding_summary': PDF_CODE_PATTERNS,
+    'material': MATERIAL_CODE_PATTERNS,
+}
+# 日誌中各快取鍵的名稱
+CODE_LABELS = {'ndt_codes': "NDT 編號", 'welding_codes': "焊材材證編號", 'heat_numbers': "爐號"}
+
+# 銲道追溯表的欄位版面設定，依範本名稱列出，逐一嘗試直到找到欄位為止
+#   enabled: 是否對此範本啟用表格欄位擷取（新增的範本先關閉，確認版面後再開啟）
+#   header: 欄位標題文字的正則表達式（比對單一字詞），頁面上必須恰好有一個字詞符合，
+#           多個字詞符合（例如另有 "Mill Cert" 欄位）時該頁改為全頁比對
+#   x_margin: 欄位左右容許的偏移（pt），欄位內容的中心點須落在標題範圍加上偏移之內
+#   x_range: (x0, x1) 直接指定欄位的 x 範圍（pt），提供時不需尋找標題
+WELDING_TABLE_LAYOUTS = {
+    'default': {'enabled': True, 'header': r'(?i)^(consumables?|cert\.?|材證)$', 'x_margin': 12, 'x_range': None},
+}
+# 物料追溯表的爐號欄位版面設定，格式同上
+MATERIAL_TABLE_LAYOUTS = {
+    'default': {'enabled': False, 'header': r'(?i)^(heat|爐號)$', 'x_margin': 20, 'x_range': None},
+}
+
+# 各文件類型的逐頁掃描設定
+#   pages: (起始頁, 結束頁) 頁碼範圍（從 0 起算，不含結束頁），None 表示全部頁面
+#   clip: (x0, y0, x1, y1) 只擷取頁面中的此範圍，None 表示整頁
+#   stop_when_found: 這些快取鍵都找到編號後即停止掃描後續頁面
+#   table_columns: 快取鍵 -> 欄位版面設定；只使用 enabled 的範本，這些編號只從表格的指定欄位擷取，
+#                  頁面找不到欄位時改為全頁比對
+#   column_only: 這些快取鍵只從表格欄位擷取，找不到欄位的頁面（或沒有啟用的範本時）不做全頁比對
+PDF_SCAN_PROFILES = {
+    'welding_summary': {'pages': None, 'clip': None, 'stop_when_found': (),
+                        'table_columns': {'welding_codes': WELDING_TABLE_LAYOUTS}},
+    'material': {'pages': None, 'clip': None, 'stop_when_found': (),
+                 'table_columns': {'heat_numbers': MATERIAL_TABLE_LAYOUTS}, 'column_only': ('heat_numbers',)},
+}
+PDF_SCAN_MAX_CARRY = 256  # 跨頁保留的未完成字串長度上限
+PDF_EXTRACTION_VERSION = 4  # 擷取程式邏輯變更時遞增；掃描設定與欄位版面的變更由 pdf_extraction_version() 自動反映
+
+def connect_sqlite(db_file):
+    """開啟 SQLite 資料庫連線（WAL 模式、自動提交），可供多個程序同時使用。"""
+    conn = sqlite3.connect(db_file, timeout=30, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
 
 class FileCache:
-    """檔案快取類別，用於儲存檔案的修改時間和資料。"""
+    """
+    檔案快取類別，以 SQLite（WAL 模式）儲存檔案指紋與資料。
+    每筆紀錄獨立寫入並立即提交，執行中斷也不會遺失已完成的結果，且可供多個程序同時使用。
+    檔案指紋為 (大小, mtime_ns, inode)，指紋不符的紀錄會在讀取時移除。
+    """
     def __init__(self, cache_file=CACHE_FILE):
         self.cache_file = cache_file
-        self.cache = {}
-        self.lock = threading.Lock()
-        self._load_cache()
+        self.local = threading.local()
+        self._init_db()
+
+    def _connect(self):
+        """取得目前執行緒專用的資料庫連線。"""
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = connect_sqlite(self.cache_file)
+            self.local.conn = conn
+        return conn
+
+    def _init_db(self):
+        """建立快取資料表。"""
+        try:
+            self._connect().execute(
+                "CREATE TABLE IF NOT EXISTS file_cache ("
+                "path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, inode INTEGER, "
+                "data TEXT NOT NULL, last_seen REAL NOT NULL)"
+            )
+            logging.info(f"成功開啟快取資料庫: {self.cache_file}")
+        except Exception as e:
+            logging.error(f"無法開啟快取資料庫 {self.cache_file}: {e}")
 
-    def _load_cache(self):
-        """從檔案載入快取資料。"""
-        if os.path.exists(self.cache_file):
-            try:
-                with open(self.cache_file, 'r', encoding='utf-8') as f:
-                    self.cache = json.load(f)
-                logging.info(f"成功載入快取檔案: {self.cache_file}")
-            except Exception as e:
-                logging.error(f"無法載入快取檔案 {self.cache_file}: {e}")
-                self.cache = {}
+    @staticmethod
+    def _fingerprint(file_path):
+        """取得檔案指紋 (大小, mtime_ns, inode)。"""
+        stat = os.stat(file_path)
+        return stat.st_size, stat.st_mtime_ns, stat.st_ino
 
     def save_cache(self):
-        """將快取資料儲存到檔案。"""
-        with self.lock:
-            try:
-                with open(self.cache_file, 'w', encoding='utf-8') as f:
-                    json.dump(self.cache, f, ensure_ascii=False, indent=4)
-                logging.info(f"成功儲存快取檔案: {self.cache_file}")
-            except Exception as e:
-                logging.error(f"無法儲存快取檔案 {self.cache_file}: {e}")
+        """清除長期未使用的紀錄並將 WAL 寫回資料庫。每筆紀錄在更新時已提交，此處不需整體寫入。"""
+        try:
+            conn = self._connect()
+            cutoff = time.time() - CACHE_MAX_AGE_DAYS * 86400
+            evicted = conn.execute("DELETE FROM file_cache WHERE last_seen < ?", (cutoff,)).rowcount
+            conn.execute("PRAGMA wal_checkpoint(PASSIVE)")
+            logging.info(f"成功整理快取資料庫: {self.cache_file}，清除 {evicted} 筆過期紀錄")
+        except Exception as e:
+            logging.error(f"無法整理快取資料庫 {self.cache_file}: {e}")
 
     def get_file_data(self, file_path):
         """
-        取得檔案的快取資料，若檔案未修改則返回快取，否則返回 None。
+        取得檔案的快取資料，若檔案未修改則返回快取，否則移除過期紀錄並返回 None。
         Args:
             file_path (str): 檔案路徑。
         Returns:
             dict or None: 快取資料，如果檔案已修改則返回 None。
         """
-        with self.lock:
-            cached = self.cache.get(file_path)
-            if cached:
-                try:
-                    current_mtime = os.path.getmtime(file_path)
-                    if cached['mtime'] == current_mtime:
-                        return cached['data']
-                except FileNotFoundError:
-                    logging.warning(f"快取中檔案不存在: {file_path}")
-                    return None
-                except Exception as e:
-                    logging.error(f"無法取得檔案修改時間 {file_path}: {e}")
+        try:
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT size, mtime_ns, inode, data, last_seen FROM file_cache WHERE path = ?", (file_path,)
+            ).fetchone()
+            if row is None:
+                return None
+            try:
+                fingerprint = self._fingerprint(file_path)
+            except FileNotFoundError:
+                logging.warning(f"快取中檔案不存在: {file_path}")
+                conn.execute("DELETE FROM file_cache WHERE path = ?", (file_path,))
+                return None
+            if tuple(row[:3]) != fingerprint:
+                conn.execute("DELETE FROM file_cache WHERE path = ?", (file_path,))
+                return None
+            now = time.time()
+            if now - row[4] > 86400:
+                conn.execute("UPDATE file_cache SET last_seen = ? WHERE path = ?", (now, file_path))
+            return json.loads(row[3])
+        except Exception as e:
+            logging.error(f"無法讀取快取資料 {file_path}: {e}")
             return None
 
     def update_file_data(self, file_path, data):
         """
-        更新檔案的快取資料。
+        更新檔案的快取資料。檔案未修改時與既有資料合併，避免覆蓋其他鍵。
         Args:
             file_path (str): 檔案路徑。
             data (dict): 要儲存的資料。
         """
+        try:
+            fingerprint = self._fingerprint(file_path)
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT size, mtime_ns, inode, data FROM file_cache WHERE path = ?", (file_path,)
+                ).fetchone()
+                merged = json.loads(row[3]) if row and tuple(row[:3]) == fingerprint else {}
+                merged.update(data)
+                conn.execute(
+                    "INSERT INTO file_cache (path, size, mtime_ns, inode, data, last_seen) VALUES (?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT(path) DO UPDATE SET size = excluded.size, mtime_ns = excluded.mtime_ns, "
+                    "inode = excluded.inode, data = excluded.data, last_seen = excluded.last_seen",
+                    (file_path, *fingerprint, json.dumps(merged, ensure_ascii=False), time.time())
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        except Exception as e:
+            logging.error(f"無法更新快取檔案 {file_path}: {e}")
+
+# 來源資料夾索引相關類別
+class SourceTreeIndex:
+    """
+    來源資料夾索引類別，記錄每個資料夾的修改時間、子資料夾與檔案資訊（大小、修改時間）。
+    透過比對資料夾 mtime 增量更新，只有內容有變動的資料夾才會重新列出。
+    注意：檔案原地覆寫不會改變資料夾 mtime，因此索引中的大小與修改時間僅供參考。
+    同一索引檔由多個來源資料夾共用（例如背景預熱與本次處理），寫回時以索引檔為單位的鎖保護讀取-合併-寫入。
+    """
+    file_locks = defaultdict(threading.Lock)  # 索引檔絕對路徑 -> 寫回索引檔時使用的鎖
+    file_locks_guard = threading.Lock()
+
+    def __init__(self, root_folder, index_file, file_filter=None):
+        self.root_folder = os.path.normpath(root_folder)
+        self.index_file = index_file
+        self.file_filter = file_filter or (lambda file_name: True)
+        self.dirs = {}
+        self.lock = threading.Lock()
+        self._dirty = False
+        self._load_index()
+
+    def _load_index(self):
+        """從索引檔載入此來源資料夾的索引資料。"""
+        if os.path.exists(self.index_file):
+            try:
+                with open(self.index_file, 'r', encoding='utf-8') as f:
+                    self.dirs = json.load(f).get(self.root_folder, {})
+                logging.info(f"成功載入來源索引: {self.index_file} ({self.root_folder})")
+            except Exception as e:
+                logging.error(f"無法載入來源索引 {self.index_file}: {e}")
+                self.dirs = {}
+
+    def save_index(self):
+        """將索引資料寫回索引檔，保留檔案中其他來源資料夾的索引。"""
+        with SourceTreeIndex.file_locks_guard:
+            file_lock = SourceTreeIndex.file_locks[os.path.abspath(self.index_file)]
+        with self.lock, file_lock:
+            if not self._dirty:
+                return
+            try:
+                data = {}
+                if os.path.exists(self.index_file):
+                    with open(self.index_file, 'r', encoding='utf-8') as f:
+                        data = json.load(f)
+                data[self.root_folder] = self.dirs
+                temp_file = f"{self.index_file}.{os.getpid()}.{threading.get_ident()}.tmp"
+                with open(temp_file, 'w', encoding='utf-8') as f:
+                    json.dump(data, f, ensure_ascii=False)
+                os.replace(temp_file, self.index_file)
+                self._dirty = False
+                logging.info(f"成功儲存來源索引: {self.index_file} ({self.root_folder})")
+            except Exception as e:
+                logging.error(f"無法儲存來源索引 {self.index_file}: {e}")
+
+    def _scan_dir(self, dir_path, mtime_ns):
+        """列出單一資料夾的內容。"""
+        subdirs = []
+        files = {}
+        with os.scandir(dir_path) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.name)
+                    elif entry.is_file() and self.file_filter(entry.name):
+                        stat = entry.stat()
+                        files[entry.name] = [stat.st_size, stat.st_mtime]
+                except OSError as e:
+                    logging.warning(f"無法讀取項目 {entry.path}: {e}")
+        return {'mtime_ns': mtime_ns, 'subdirs': sorted(subdirs), 'files': files}
+
+    def relative_path(self, path):
+        """將絕對路徑轉為索引中的相對路徑，不在來源資料夾內時返回 None。"""
+        rel_path = os.path.relpath(os.path.normpath(path), self.root_folder)
+        if rel_path == os.curdir:
+            return ''
+        if rel_path == os.pardir or rel_path.startswith(os.pardir + os.sep):
+            return None
+        return rel_path
+
+    @staticmethod
+    def _is_under(rel_path, start_path):
+        return not start_path or rel_path == start_path or rel_path.startswith(start_path + os.sep)
+
+    def refresh(self, changed_dirs=None):
+        """
+        增量更新索引：逐一檢查資料夾 mtime，僅重新列出有變動的資料夾。
+        Args:
+            changed_dirs (iterable): 已知有變動的資料夾（絕對路徑）。提供時只檢查這些資料夾及其子資料夾，
+                且一律重新列出這些資料夾；None 表示檢查整個來源資料夾。
+        Returns:
+            int: 重新列出的資料夾數量。
+        """
+        with self.lock:
+            old_dirs = self.dirs
+            if changed_dirs is None:
+                start_paths = ['']
+                new_dirs = {}
+            else:
+                rel_paths = {rel_path for rel_path in map(self.relative_path, changed_dirs) if rel_path is not None}
+                start_paths = [rel_path for rel_path in rel_paths
+                               if not any(other != rel_path and self._is_under(rel_path, other) for other in rel_paths)]
+                new_dirs = {rel_path: entry for rel_path, entry in old_dirs.items()
+                            if not any(self._is_under(rel_path, start_path) for start_path in start_paths)}
+            forced = set() if changed_dirs is None else set(start_paths)
+            rescanned = 0
+            stack = list(start_paths)
+            while stack:
+                rel_path = stack.pop()
+                dir_path = os.path.join(self.root_folder, rel_path) if rel_path else self.root_folder
+                try:
+                    mtime_ns = os.stat(dir_path).st_mtime_ns
+                    entry = old_dirs.get(rel_path)
+                    if entry is None or entry['mtime_ns'] != mtime_ns or rel_path in forced:
+                        entry = self._scan_dir(dir_path, mtime_ns)
+                        rescanned += 1
+                except OSError as e:
+                    logging.warning(f"無法讀取資料夾 {dir_path}: {e}")
+                    continue
+                new_dirs[rel_path] = entry
+                stack.extend(os.path.join(rel_path, name) if rel_path else name for name in entry['subdirs'])
+            if rescanned or new_dirs.keys() != old_dirs.keys():
+                self._dirty = True
+            self.dirs = new_dirs
+        logging.info(f"來源索引更新完成: {self.root_folder}，重新列出 {rescanned}/{len(new_dirs)} 個資料夾")
+        return rescanned
+
+    def iter_files(self):
+        """依資料夾與檔名排序，逐一產生 (檔案路徑, 大小, 修改時間)。"""
+        for rel_path in sorted(self.dirs):
+            dir_path = os.path.join(self.root_folder, rel_path) if rel_path else self.root_folder
+            files = self.dirs[rel_path]['files']
+            for file_name in sorted(files):
+                size, mtime = files[file_name]
+                yield os.path.join(dir_path, file_name), size, mtime
+
+class NdtReportIndex(SourceTreeIndex):
+    """報驗單索引類別，將 NDT 編號對應到有效與作廢的報驗單檔案。"""
+    def __init__(self, root_folder, index_file=NDT_INDEX_FILE):
+        super().__init__(
+            root_folder, index_file,
+            file_filter=lambda file_name: (file_name.endswith('.pdf') and not file_name.startswith('~$')
+                                           and RE_NDT_SOURCE_FILENAME.search(file_name) is not None)
+        )
+        self.codes = {}
+
+    def refresh(self, changed_dirs=None):
+        """更新索引並重建 NDT 編號對照表。"""
+        rescanned = super().refresh(changed_dirs)
+        codes = {}
+        for file_path, size, mtime in self.iter_files():
+            file_name = os.path.basename(file_path)
+            ndt_code = RE_NDT_SOURCE_FILENAME.search(file_name).group(1)
+            entry = codes.setdefault(ndt_code, {'valid': None, 'cancelled': None})
+            entry['cancelled' if "作廢" in file_name else 'valid'] = {'path': file_path, 'size': size, 'mtime': mtime}
+        self.codes = codes
+        return rescanned
+
+    def lookup(self, ndt_code):
+        """
+        查詢 NDT 編號對應的報驗單檔案。
+        Returns:
+            dict or None: {'valid': 檔案資訊或 None, 'cancelled': 檔案資訊或 None}。
+        """
+        return self.codes.get(ndt_code)
+
+def load_ndt_report_index(ndt_source_pdf_folder):
+    """載入並增量更新報驗單索引。"""
+    ndt_index = NdtReportIndex(ndt_source_pdf_folder)
+    ndt_index.refresh()
+    ndt_index.save_index()
+    return ndt_index
+
+class WeldingCertIndex(SourceTreeIndex):
+    """焊材材證檔名索引類別，記錄焊材材證來源資料夾中的所有 PDF 檔案。"""
+    def __init__(self, root_folder, index_file=WELDING_INDEX_FILE):
+        super().__init__(
+            root_folder, index_file,
+            file_filter=lambda file_name: file_name.endswith('.pdf') and not file_name.startswith('~$')
+        )
+
+def load_welding_cert_index(welding_source_pdf_folder):
+    """載入並增量更新焊材材證檔名索引。"""
+    welding_index = WeldingCertIndex(welding_source_pdf_folder)
+    welding_index.refresh()
+    welding_index.save_index()
+    return welding_index
+
+class MillCertIndex(SourceTreeIndex):
+    """鋼廠材證檔名索引類別，記錄鋼廠材證來源資料夾中的所有 PDF 檔案（檔名含爐號）。"""
+    def __init__(self, root_folder, index_file=MILL_CERT_INDEX_FILE):
+        super().__init__(
+            root_folder, index_file,
+            file_filter=lambda file_name: file_name.endswith('.pdf') and not file_name.startswith('~$')
+        )
+
+def load_mill_cert_index(mill_cert_source_folder):
+    """載入並增量更新鋼廠材證檔名索引。"""
+    mill_cert_index = MillCertIndex(mill_cert_source_folder)
+    mill_cert_index.refresh()
+    mill_cert_index.save_index()
+    return mill_cert_index
+
+# 單次執行檔案緩衝區
+def read_file_buffer(file_path):
+    """讀取整份檔案：小檔案讀入記憶體，大檔案以 mmap 對應。返回 (緩衝區, os.stat_result)。"""
+    with open(file_path, 'rb') as f:
+        stat = os.fstat(f.fileno())
+        if stat.st_size >= MMAP_THRESHOLD_BYTES:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ), stat
+        return f.read(), stat
+
+class RunFileBuffers:
+    """
+    單次執行內共用的來源檔案緩衝區。每份來源檔案只從網路讀取一次，之後的雜湊計算與寫入目標資料夾
+    都使用同一份緩衝區；讀入記憶體與以 mmap 對應的緩衝區都計入總量，超過 RUN_BUFFER_MAX_BYTES 時
+    依最近使用時間釋放。使用中的緩衝區以 use() 標記，被釋放的 mmap 等最後一個使用者結束後才關閉；
+    執行結束時以 close()（或 with 區塊）關閉所有 mmap。
+    """
+    def __init__(self, max_bytes=RUN_BUFFER_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.path_locks = defaultdict(threading.Lock)
+        self.buffers = OrderedDict()
+        self.stats = {}
+        self.digests = {}
+        self.total_bytes = 0
+        self.pins = defaultdict(int)  # id(緩衝區) -> 使用中的次數
+        self.retired = {}  # 已釋放但仍在使用中的 mmap：id(緩衝區) -> 緩衝區，使用結束後關閉
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def stat(self, file_path):
+        """取得來源檔案的 stat，每次執行只查詢一次。"""
+        with self.lock:
+            stat = self.stats.get(file_path)
+        if stat is None:
+            stat = os.stat(file_path)
+            with self.lock:
+                self.stats[file_path] = stat
+        return stat
+
+    def _discard(self, buffer):
+        """釋放一份已移出的緩衝區（需持有 self.lock）：mmap 沒有使用者時立即關閉，否則等使用結束。"""
+        if isinstance(buffer, mmap.mmap):
+            if self.pins.get(id(buffer)):
+                self.retired[id(buffer)] = buffer
+            else:
+                buffer.close()
+
+    def _acquire(self, file_path):
+        """取得來源檔案內容並標記為使用中，第一次使用時讀取。"""
+        with self.lock:
+            path_lock = self.path_locks[file_path]
+        with path_lock:
+            with self.lock:
+                if file_path in self.buffers:
+                    self.buffers.move_to_end(file_path)
+                    buffer = self.buffers[file_path]
+                    self.pins[id(buffer)] += 1
+                    return buffer
+            buffer, stat = read_file_buffer(file_path)
+            with self.lock:
+                self.stats[file_path] = stat
+                self.buffers[file_path] = buffer
+                self.pins[id(buffer)] += 1
+                self.total_bytes += len(buffer)
+                while self.total_bytes > self.max_bytes and len(self.buffers) > 1:
+                    _, evicted = self.buffers.popitem(last=False)
+                    self.total_bytes -= len(evicted)
+                    self._discard(evicted)
+            return buffer
+
+    def _release(self, buffer):
+        """結束使用緩衝區；已被釋放的 mmap 在最後一個使用者結束時關閉。"""
+        with self.lock:
+            key = id(buffer)
+            self.pins[key] -= 1
+            if self.pins[key]:
+                return
+            del self.pins[key]
+            retired = self.retired.pop(key, None)
+        if retired is not None:
+            retired.close()
+
+    @contextmanager
+    def use(self, file_path):
+        """在 with 區塊內使用來源檔案內容，區塊結束前緩衝區不會被關閉。"""
+        buffer = self._acquire(file_path)
+        try:
+            yield buffer
+        finally:
+            self._release(buffer)
+
+    def sha256(self, file_path):
+        """計算來源檔案內容的 SHA-256。"""
+        with self.lock:
+            digest = self.digests.get(file_path)
+        if digest is None:
+            with self.use(file_path) as buffer:
+                digest = hashlib.sha256(buffer).hexdigest()
+            with self.lock:
+                self.digests[file_path] = digest
+        return digest
+
+    def write_to(self, file_path, target_file_path):
+        """將來源檔案內容寫入目標路徑，並保留來源的修改時間（與 shutil.copy2 相同）。"""
+        with self.use(file_path) as buffer, open(target_file_path, 'wb') as f:
+            f.write(buffer)
+        stat = self.stat(file_path)
+        os.utime(target_file_path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+    def close(self):
+        """執行結束時釋放所有緩衝區並關閉 mmap；仍在使用中的 mmap 於使用結束時關閉。"""
+        with self.lock:
+            for buffer in self.buffers.values():
+                self._discard(buffer)
+            self.buffers.clear()
+            self.total_bytes = 0
+
+# 內容定址證書存放區
+class CertificateStore:
+    """
+    內容定址的證書存放區。每份證書依內容的 SHA-256 存放一次，來源檔案的雜湊值記錄在檔案快取中，
+    來源未變更時不需再次讀取；放入目標資料夾時優先使用硬連結。提供 file_buffers 時，
+    雜湊與寫入存放區共用同一份單次執行緩衝區。
+    """
+    def __init__(self, store_folder, cache, file_buffers=None):
+        self.store_folder = store_folder
+        self.cache = cache
+        self.file_buffers = file_buffers
+        self.lock = threading.Lock()
+        self.source_locks = defaultdict(threading.Lock)
+        self.fetched = {}
+        os.makedirs(os.path.join(self.store_folder, 'objects'), exist_ok=True)
+
+    def _object_path(self, digest):
+        return os.path.join(self.store_folder, 'objects', digest[:2], f"{digest}.pdf")
+
+    def _store_source(self, source_file_path):
+        """讀取來源檔案一次，同時計算雜湊並寫入存放區。返回 SHA-256。"""
+        # 暫存檔名由 tempfile 建立，存放區由多個程序（例如批次處理）共用時也不會互相覆寫
+        with tempfile.NamedTemporaryFile(dir=self.store_folder, prefix='incoming_', suffix='.tmp', delete=False) as f:
+            temp_path = f.name
+        try:
+            if self.file_buffers:
+                self.file_buffers.write_to(source_file_path, temp_path)
+                digest = self.file_buffers.sha256(source_file_path)
+            else:
+                sha256 = hashlib.sha256()
+                with open(source_file_path, 'rb') as src, open(temp_path, 'wb') as dst:
+                    for chunk in iter(lambda: src.read(COPY_BUFFER_SIZE), b''):
+                        sha256.update(chunk)
+                        dst.write(chunk)
+                shutil.copystat(source_file_path, temp_path)
+                digest = sha256.hexdigest()
+        except Exception:
+            os.remove(temp_path)
+            raise
+        object_path = self._object_path(digest)
+        os.makedirs(os.path.dirname(object_path), exist_ok=True)
+        if os.path.exists(object_path):
+            os.remove(temp_path)
+        else:
+            os.replace(temp_path, object_path)
+        return digest
+
+    def fetch(self, source_file_path):
+        """
+        取得來源證書在存放區中的路徑，必要時才從來源讀取。
+        Returns:
+            str: 存放區中的檔案路徑。
+        """
+        with self.lock:
+            source_lock = self.source_locks[source_file_path]
+        with source_lock:
+            object_path = self.fetched.get(source_file_path)
+            if object_path:
+                return object_path
+            cached_data = self.cache.get_file_data(source_file_path)
+            digest = cached_data.get('sha256') if cached_data else None
+            if not digest or not os.path.exists(self._object_path(digest)):
+                digest = self._store_source(source_file_path)
+                self.cache.update_file_data(source_file_path, {'sha256': digest})
+                logging.info(f"已存入證書存放區: {source_file_path} -> {digest}")
+            object_path = self._object_path(digest)
+            self.fetched[source_file_path] = object_path
+            return object_path
+
+    def materialize(self, source_file_path, target_file_path):
+        """將來源證書放入目標路徑：優先建立硬連結，無法建立時改為從存放區複製。"""
+        object_path = self.fetch(source_file_path)
+        if os.path.lexists(target_file_path):
+            os.remove(target_file_path)
+        try:
+            os.link(object_path, target_file_path)
+        except OSError:
+            shutil.copy2(object_path, target_file_path)
+
+# 來源檔案本機鏡像
+class SourceMirror:
+    """
+    網路來源資料夾的本機讀取鏡像。讀取來源檔案時先回傳本機副本，本機副本依來源的大小與修改時間驗證，
+    不符時才重新從網路複製；總容量超過上限時依最近使用時間（LRU）淘汰。
+    驗證只需對網路檔案 stat 一次，內容則從本機磁碟讀取。
+    """
+    def __init__(self, mirror_folder, max_bytes=MIRROR_MAX_BYTES):
+        self.mirror_folder = mirror_folder
+        self.max_bytes = max_bytes
+        os.makedirs(os.path.join(mirror_folder, 'files'), exist_ok=True)
+        self.conn = sqlite3.connect(os.path.join(mirror_folder, 'manifest.db'), timeout=30,
+                                    isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS mirror_files ("
+            "remote_path TEXT PRIMARY KEY, size INTEGER NOT NULL, mtime REAL NOT NULL, last_used REAL NOT NULL)"
+        )
+        self.lock = threading.Lock()
+        self.path_locks = defaultdict(threading.Lock)
+        self.pins = defaultdict(int)  # 來源路徑 -> 使用中的次數，使用中的本機副本不會被淘汰或刪除
+        self.refresh_thread = None
+
+    def _local_file_path(self, remote_path):
+        digest = hashlib.sha1(os.path.normcase(remote_path).encode('utf-8')).hexdigest()
+        return os.path.join(self.mirror_folder, 'files', digest[:2], f"{digest}.pdf")
+
+    def _remote_fingerprint(self, remote_path):
+        stat = os.stat(remote_path)
+        return stat.st_size, stat.st_mtime
+
+    def _copy_from_remote(self, remote_path, fingerprint):
+        local_path = self._local_file_path(remote_path)
+        os.makedirs(os.path.dirname(local_path), exist_ok=True)
+        # 暫存檔名由 tempfile 建立，GUI、--watch 與 --batch 共用鏡像資料夾時也不會互相覆寫
+        with tempfile.NamedTemporaryFile(dir=os.path.dirname(local_path), suffix='.tmp', delete=False) as f:
+            temp_path = f.name
+        try:
+            shutil.copy2(remote_path, temp_path)
+            os.replace(temp_path, local_path)
+        except Exception:
+            os.remove(temp_path)
+            raise
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO mirror_files (remote_path, size, mtime, last_used) VALUES (?, ?, ?, ?)",
+                (remote_path, fingerprint[0], fingerprint[1], time.time())
+            )
+        logging.info(f"已更新本機鏡像: {remote_path}")
+        self._evict()
+        return local_path
+
+    def local_path(self, remote_path):
+        """
+        取得來源檔案的本機副本路徑，本機副本不存在或已過期時從網路複製。
+        Returns:
+            str: 本機副本路徑；鏡像失敗時返回原始路徑。
+        """
         with self.lock:
+            path_lock = self.path_locks[remote_path]
+        with path_lock:
             try:
-                mtime = os.path.getmtime(file_path)
-                self.cache[file_path] = {'mtime': mtime, 'data': data}
+                fingerprint = self._remote_fingerprint(remote_path)
+                local_path = self._local_file_path(remote_path)
+                with self.lock:
+                    row = self.conn.execute(
+                        "SELECT size, mtime FROM mirror_files WHERE remote_path = ?", (remote_path,)
+                    ).fetchone()
+                if row and tuple(row) == tuple(fingerprint) and os.path.exists(local_path):
+                    with self.lock:
+                        self.conn.execute("UPDATE mirror_files SET last_used = ? WHERE remote_path = ?",
+                                          (time.time(), remote_path))
+                    return local_path
+                return self._copy_from_remote(remote_path, fingerprint)
             except Exception as e:
-                logging.error(f"無法更新快取檔案 {file_path}: {e}")
+                logging.error(f"無法使用本機鏡像 {remote_path}: {e}")
+                return remote_path
+
+    @contextmanager
+    def use(self, remote_path):
+        """
+        在 with 區塊內使用來源檔案的本機副本（同 local_path），區塊結束前該副本不會被淘汰。
+        在取得副本之前就標記為使用中，複製後觸發的淘汰也不會刪除剛複製的副本。
+        """
+        with self.lock:
+            self.pins[remote_path] += 1
+        try:
+            yield self.local_path(remote_path)
+        finally:
+            with self.lock:
+                self.pins[remote_path] -= 1
+                if not self.pins[remote_path]:
+                    del self.pins[remote_path]
+
+    def _evict(self):
+        """總容量超過上限時，依最近使用時間淘汰本機副本，使用中的副本不淘汰。"""
+        with self.lock:
+            total_bytes = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM mirror_files").fetchone()[0]
+            if total_bytes <= self.max_bytes:
+                return
+            rows = self.conn.execute("SELECT remote_path, size FROM mirror_files ORDER BY last_used").fetchall()
+            for remote_path, size in rows:
+                if total_bytes <= self.max_bytes:
+                    break
+                if self.pins.get(remote_path):
+                    continue
+                try:
+                    os.remove(self._local_file_path(remote_path))
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    logging.warning(f"無法刪除本機鏡像檔案 {remote_path}: {e}")
+                    continue
+                self.conn.execute("DELETE FROM mirror_files WHERE remote_path = ?", (remote_path,))
+                total_bytes -= size
+        logging.info(f"本機鏡像已淘汰舊檔案，目前容量 {total_bytes} 位元組")
+
+    def _refresh_changed(self):
+        with self.lock:
+            rows = self.conn.execute("SELECT remote_path, size, mtime FROM mirror_files").fetchall()
+        for remote_path, size, mtime in rows:
+            try:
+                fingerprint = self._remote_fingerprint(remote_path)
+            except FileNotFoundError:
+                self._forget(remote_path)
+                continue
+            except OSError:
+                continue
+            if fingerprint != (size, mtime):
+                self.local_path(remote_path)
+
+    def _forget(self, remote_path):
+        """來源檔案已不存在時移除本機副本，使用中的副本留待下次更新時處理。"""
+        with self.lock:
+            if self.pins.get(remote_path):
+                return
+        try:
+            os.remove(self._local_file_path(remote_path))
+        except FileNotFoundError:
+            pass
+        with self.lock:
+            self.conn.execute("DELETE FROM mirror_files WHERE remote_path = ?", (remote_path,))
+
+    def refresh_async(self):
+        """在背景執行緒更新已鏡像但來源已變更的檔案。"""
+        if self.refresh_thread and self.refresh_thread.is_alive():
+            return
+        self.refresh_thread = threading.Thread(target=self._refresh_changed, daemon=True)
+        self.refresh_thread.start()
+
+def create_source_mirror():
+    """依 MIRROR_FOLDER 設定建立來源檔案本機鏡像，並在背景更新已變更的副本；未設定時返回 None。"""
+    if not MIRROR_FOLDER:
+        return None
+    source_mirror = SourceMirror(MIRROR_FOLDER)
+    source_mirror.refresh_async()
+    return source_mirror
+
+# 多字串比對相關類別
+class AhoCorasickMatcher:
+    """多字串比對器（Aho-Corasick），一次掃描即可找出字串中出現的所有編號，不分大小寫。"""
+    def __init__(self, patterns):
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [[]]
+        for pattern in set(patterns):
+            if pattern:
+                self._add_pattern(pattern)
+        self._build_failure_links()
+
+    def _add_pattern(self, pattern):
+        node = 0
+        for char in pattern.lower():
+            next_node = self.goto[node].get(char)
+            if next_node is None:
+                next_node = len(self.goto)
+                self.goto.append({})
+                self.fail.append(0)
+                self.output.append([])
+                self.goto[node][char] = next_node
+            node = next_node
+        self.output[node].append(pattern)
+
+    def _build_failure_links(self):
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, next_node in self.goto[node].items():
+                queue.append(next_node)
+                fail_node = self.fail[node]
+                while fail_node and char not in self.goto[fail_node]:
+                    fail_node = self.fail[fail_node]
+                self.fail[next_node] = self.goto[fail_node].get(char, 0)
+                self.output[next_node] = self.output[next_node] + self.output[self.fail[next_node]]
+
+    def find_all(self, text):
+        """
+        找出字串中出現的所有編號。
+        Returns:
+            set: 出現在字串中的編號（原始大小寫）。
+        """
+        found = set()
+        node = 0
+        for char in text.lower():
+            while node and char not in self.goto[node]:
+                node = self.fail[node]
+            node = self.goto[node].get(char, 0)
+            if self.output[node]:
+                found.update(self.output[node])
+        return found
+
+class TokenMatcher:
+    """完整字詞比對器：只有字串中以非英數字元分隔的完整字詞與編號相同（不分大小寫）時才視為出現。"""
+    def __init__(self, patterns):
+        self.patterns = {pattern.upper(): pattern for pattern in patterns if pattern}
+
+    def find_all(self, text):
+        """
+        找出字串中以完整字詞出現的所有編號。
+        Returns:
+            set: 出現在字串中的編號（原始大小寫）。
+        """
+        return {self.patterns[token] for token in RE_FILENAME_TOKEN_SEPARATOR.split(text.upper())
+                if token in self.patterns}
+
+class WeldingCertResolver:
+    """
+    焊材材證編號解析器。以多字串比對器一次掃描材證檔名索引，並記住已解析的編號，
+    同一次執行中每個編號只需解析一次。
+    """
+    CODE_LABEL = "焊材材證編號"
+    MATCHER = AhoCorasickMatcher
+
+    def __init__(self, welding_index):
+        self.welding_index = welding_index
+        self.resolved = {}
+        self.lock = threading.Lock()
+
+    def resolve(self, codes):
+        """
+        解析焊材材證編號對應的檔案。
+        Returns:
+            dict: 編號 -> 材證檔案路徑（未找到時為 None）。
+        """
+        with self.lock:
+            pending = {code for code in codes if code not in self.resolved}
+            if pending:
+                matcher = self.MATCHER(pending)
+                found = {}
+                for file_path, _, _ in self.welding_index.iter_files():
+                    for code in matcher.find_all(os.path.basename(file_path)):
+                        found.setdefault(code, file_path)
+                    if len(found) == len(pending):
+                        break
+                for code in pending:
+                    self.resolved[code] = found.get(code)
+                logging.info(f"{self.CODE_LABEL}解析完成: {len(found)}/{len(pending)} 個編號找到對應檔案")
+            return {code: self.resolved[code] for code in codes}
+
+class MillCertResolver(WeldingCertResolver):
+    """
+    鋼廠材證爐號解析器，以鋼廠材證檔名索引解析爐號對應的材證檔案。
+    爐號只與檔名中的完整字詞比對，A12345 不會對應到 A123456_MTC.pdf。
+    """
+    CODE_LABEL = "爐號"
+    MATCHER = TokenMatcher
+
+# 編號反向索引
+def escape_like(text):
+    """跳脫 SQL LIKE 的萬用字元。"""
+    return text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+class CodeReferenceIndex:
+    """
+    編號反向索引類別，以 SQLite 記錄每個 NDT / 焊材材證編號被哪些目標資料夾與銲道追溯 PDF 引用，
+    以及各目標資料夾中該編號是否已找到對應檔案，查詢時不需重新開啟任何 PDF。
+    """
+    KINDS = {'ndt': 'ndt_codes', 'welding': 'welding_codes'}
+
+    def __init__(self, index_file=REFERENCE_INDEX_FILE):
+        self.index_file = index_file
+        self.conn = connect_sqlite(index_file)
+        self.lock = threading.Lock()
+        self.conn.executescript(
+            "CREATE TABLE IF NOT EXISTS code_references ("
+            "kind TEXT NOT NULL, code TEXT NOT NULL, target_folder TEXT NOT NULL, summary_pdf TEXT NOT NULL, "
+            "PRIMARY KEY (kind, code, target_folder, summary_pdf));"
+            "CREATE TABLE IF NOT EXISTS code_status ("
+            "kind TEXT NOT NULL, code TEXT NOT NULL, target_folder TEXT NOT NULL, resolved INTEGER NOT NULL, "
+            "updated_at REAL NOT NULL, PRIMARY KEY (kind, code, target_folder));"
+            "CREATE INDEX IF NOT EXISTS idx_code_references_code ON code_references (code);"
+            "CREATE INDEX IF NOT EXISTS idx_code_status_code ON code_status (code);"
+            "CREATE INDEX IF NOT EXISTS idx_code_status_resolved ON code_status (resolved);"
+        )
+
+    def record_references(self, target_folder, codes_by_file):
+        """
+        以最新擷取結果取代目標資料夾的引用紀錄。
+        Args:
+            target_folder (str): 目標資料夾路徑。
+            codes_by_file (dict): 銲道追溯 PDF -> 編號字典（PDF_CODE_PATTERNS 的快取鍵 -> 編號列表）。
+        """
+        rows = [(kind, code, target_folder, file_path)
+                for file_path, codes in codes_by_file.items()
+                for kind, key in self.KINDS.items()
+                for code in codes.get(key, [])]
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                self.conn.execute("DELETE FROM code_references WHERE target_folder = ?", (target_folder,))
+                self.conn.executemany("INSERT OR IGNORE INTO code_references VALUES (?, ?, ?, ?)", rows)
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+
+    def record_status(self, target_folder, kind, codes, missing_codes):
+        """以最新處理結果取代目標資料夾中某類編號的狀態（是否已找到對應檔案）。"""
+        now = time.time()
+        rows = [(kind, code, target_folder, 0 if code in missing_codes else 1, now) for code in codes]
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                self.conn.execute("DELETE FROM code_status WHERE target_folder = ? AND kind = ?", (target_folder, kind))
+                self.conn.executemany("INSERT INTO code_status VALUES (?, ?, ?, ?, ?)", rows)
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+
+    @staticmethod
+    def normalize_code(code):
+        """將查詢字串轉為索引中的編號，例如 'CWP-Q-R-JK-NDT-1234.pdf' 或 'NDT-1234' -> ('ndt', '1234')。"""
+        code = code.strip()
+        match = RE_NDT_SOURCE_FILENAME.search(code) or re.search(r'NDT-?(\d+)', code, re.IGNORECASE)
+        if match:
+            return 'ndt', match.group(1)
+        return None, code
+
+    def folders_referencing(self, code, waiting_only=False):
+        """
+        查詢引用某編號的目標資料夾。
+        Args:
+            code (str): NDT 或焊材材證編號。
+            waiting_only (bool): 只返回尚未找到對應檔案的資料夾。
+        Returns:
+            list: [(類別, 編號, 目標資料夾, 銲道追溯 PDF), ...]
+        """
+        kind, code = self.normalize_code(code)
+        query = ("SELECT r.kind, r.code, r.target_folder, r.summary_pdf FROM code_references r "
+                 "LEFT JOIN code_status s ON s.kind = r.kind AND s.code = r.code AND s.target_folder = r.target_folder "
+                 "WHERE r.code = ?")
+        params = [code]
+        if kind:
+            query += " AND r.kind = ?"
+            params.append(kind)
+        if waiting_only:
+            query += " AND s.resolved = 0"
+        with self.lock:
+            return self.conn.execute(query + " ORDER BY r.target_folder, r.summary_pdf", params).fetchall()
+
+    def referenced_codes(self, kind, target_root=None):
+        """返回某類別中被引用的所有編號，可限定在某個資料夾之下的目標資料夾（路徑以 normpath 形式比對）。"""
+        query = "SELECT DISTINCT code FROM code_references WHERE kind = ?"
+        params = [kind]
+        if target_root:
+            target_root = os.path.normpath(target_root)
+            query += " AND (target_folder = ? OR target_folder LIKE ? ESCAPE '\\')"
+            params += [target_root, escape_like(os.path.join(target_root, '')) + '%']
+        with self.lock:
+            return {row[0] for row in self.conn.execute(query, params)}
+
+    def codes_for_folder(self, target_folder):
+        """
+        返回目標資料夾上次擷取到的編號，格式與 process_pdf_files_in_folder 相同。
+        Returns:
+            tuple: (NDT 編號與檔名, 焊材材證編號集合)
+        """
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT DISTINCT kind, code FROM code_references WHERE target_folder = ?", (target_folder,)
+            ).fetchall()
+        ndt_codes = ndt_codes_with_filenames(code for kind, code in rows if kind == 'ndt')
+        welding_codes = {code for kind, code in rows if kind == 'welding'}
+        return ndt_codes, welding_codes
+
+    def status_counts(self, root_folder):
+        """
+        統計 root_folder 之下各目標資料夾各類編號的數量與尚未找到的數量。
+        Returns:
+            dict: 目標資料夾 -> {類別: (編號數, 未找到數)}。
+        """
+        root_folder = os.path.normpath(root_folder)
+        counts = {}
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT target_folder, kind, COUNT(*), SUM(resolved = 0) FROM code_status "
+                "WHERE target_folder = ? OR target_folder LIKE ? ESCAPE '\\' GROUP BY target_folder, kind",
+                (root_folder, escape_like(os.path.join(root_folder, '')) + '%')
+            ).fetchall()
+        for target_folder, kind, total, unresolved in rows:
+            counts.setdefault(target_folder, {})[kind] = (total, unresolved or 0)
+        return counts
+
+    def missing_codes(self, kind=None):
+        """
+        查詢整個索引中尚未找到對應檔案的編號。
+        Returns:
+            dict: (類別, 編號) -> 等待中的目標資料夾列表。
+        """
+        query = "SELECT kind, code, target_folder FROM code_status WHERE resolved = 0"
+        params = []
+        if kind:
+            query += " AND kind = ?"
+            params.append(kind)
+        missing = {}
+        with self.lock:
+            for row_kind, code, target_folder in self.conn.execute(query + " ORDER BY kind, code, target_folder", params):
+                missing.setdefault((row_kind, code), []).append(target_folder)
+        return missing
+
+# 執行報告
+REPORT_LOGGER = logging.getLogger('ndt_wm.report')
+REPORT_LOGGER.propagate = False
+REPORT_LOGGER.setLevel(logging.INFO)
+
+def report_action(action, **fields):
+    """記錄一筆執行報告動作（資料夾、路徑、編號等欄位）；沒有開啟中的執行報告時不做任何事。"""
+    if REPORT_LOGGER.handlers:
+        REPORT_LOGGER.info(action, extra={'report_fields': fields})
+
+class RunReport(logging.Handler):
+    """
+    執行報告，每個動作發生時即寫入一行 JSONL（可選擇同時寫入 CSV），不在記憶體中累積紀錄，
+    可由其他工具直接處理。以 with 使用時接收所有 report_action 的紀錄，結束時寫入各動作的筆數。
+    """
+    CSV_FIELDS = ['time', 'action', 'folder', 'path', 'source', 'code', 'detail']
+
+    def __init__(self, report_folder=REPORT_FOLDER, write_csv=REPORT_WRITE_CSV):
+        super().__init__()
+        os.makedirs(report_folder, exist_ok=True)
+        base_path = os.path.join(report_folder, f"run_{time.strftime('%Y%m%d_%H%M%S')}")
+        self.report_path = f"{base_path}.jsonl"
+        self.jsonl_file = open(self.report_path, 'w', encoding='utf-8')
+        self.csv_file = None
+        self.csv_writer = None
+        if write_csv:
+            self.csv_file = open(f"{base_path}.csv", 'w', encoding='utf-8-sig', newline='')
+            self.csv_writer = csv.DictWriter(self.csv_file, fieldnames=self.CSV_FIELDS, extrasaction='ignore')
+            self.csv_writer.writeheader()
+        self.counts = defaultdict(int)
+
+    def emit(self, record):
+        entry = {'time': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(record.created)), 'action': record.getMessage()}
+        entry.update(getattr(record, 'report_fields', {}))
+        self.jsonl_file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self.jsonl_file.flush()
+        if self.csv_writer:
+            self.csv_writer.writerow(entry)
+            self.csv_file.flush()
+        self.counts[entry['action']] += 1
+
+    def __enter__(self):
+        REPORT_LOGGER.addHandler(self)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        REPORT_LOGGER.removeHandler(self)
+        self.close()
+
+    def close(self):
+        if not self.jsonl_file.closed:
+            self.emit(logging.makeLogRecord({'msg': 'summary', 'report_fields': {'detail': dict(self.counts)}}))
+            self.jsonl_file.close()
+            if self.csv_file:
+                self.csv_file.close()
+            logging.info(f"執行報告已儲存: {self.report_path}")
+        super().close()
+
+class ReportSamples:
+    """
+    只保留筆數與前幾個範例的結果彙整，完整清單已逐筆寫入執行報告，不在記憶體中累積。
+    筆數以資料夾為單位計算，同一項目出現在多個資料夾時重複計入。
+    """
+
+    def __init__(self, sample_size=REPORT_SAMPLE_SIZE):
+        self.sample_size = sample_size
+        self.count = 0
+        self.samples = []
+
+    def add(self, item):
+        self.count += 1
+        if len(self.samples) < self.sample_size and item not in self.samples:
+            self.samples.append(item)
+
+    def update(self, items):
+        for item in items:
+            self.add(item)
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        return iter(self.samples)
+
+
+def format_samples(items, sample_size=REPORT_SAMPLE_SIZE):
+    """列出前幾個項目作為範例，其餘以筆數表示。"""
+    total = len(items)
+    items = sorted(items)
+    text = ", ".join(items[:sample_size])
+    if total > sample_size:
+        text += f" 等 {total} 項"
+    return text
+
+# 全文檢索索引
+class PdfTextIndex:
+    """
+    PDF 逐頁文字的全文檢索索引（SQLite FTS5），文字來自擷取編號時已讀出的頁面，不另外開啟 PDF。
+    每份文件依檔案指紋 (大小, mtime_ns, inode) 判斷是否需要重新索引；SQLite 支援時使用 trigram 分詞，
+    可搜尋任意子字串（含中文）。檔案路徑一律以 os.path.normpath 形式記錄與查詢。
+    """
+    def __init__(self, index_file=TEXT_INDEX_FILE):
+        self.index_file = index_file
+        self.conn = connect_sqlite(index_file)
+        self.lock = threading.Lock()
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS text_documents ("
+            "path TEXT PRIMARY KEY, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL, inode INTEGER NOT NULL, "
+            "indexed_at REAL NOT NULL)"
+        )
+        try:
+            self.conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS page_text USING fts5("
+                              "path UNINDEXED, page UNINDEXED, content, tokenize='trigram')")
+        except sqlite3.OperationalError:
+            self.conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS page_text USING fts5("
+                              "path UNINDEXED, page UNINDEXED, content)")
+
+    def is_indexed(self, file_path):
+        """檢查檔案是否已以目前的內容建立索引。"""
+        file_path = os.path.normpath(file_path)
+        try:
+            fingerprint = FileCache._fingerprint(file_path)
+        except OSError:
+            return False
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT size, mtime_ns, inode FROM text_documents WHERE path = ?", (file_path,)
+            ).fetchone()
+        return row is not None and tuple(row) == fingerprint
+
+    def begin_document(self, file_path):
+        """
+        開始重新索引檔案：清除檔案舊的索引內容，之後以 add_page 逐頁寫入、finish_document 完成。
+        Returns:
+            tuple: 開始時的檔案指紋 (大小, mtime_ns, inode)；檔案不存在時返回 None。
+        """
+        file_path = os.path.normpath(file_path)
+        try:
+            fingerprint = FileCache._fingerprint(file_path)
+        except OSError:
+            return None
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                self.conn.execute("DELETE FROM text_documents WHERE path = ?", (file_path,))
+                self.conn.execute("DELETE FROM page_text WHERE path = ?", (file_path,))
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+        return fingerprint
+
+    def add_page(self, file_path, page, text):
+        """寫入一頁文字（頁碼從 1 開始）。每頁各自提交，不保留整份文件的文字，也不會長時間佔用寫入鎖。"""
+        with self.lock:
+            self.conn.execute("INSERT INTO page_text (path, page, content) VALUES (?, ?, ?)",
+                              (os.path.normpath(file_path), page, text))
+
+    def finish_document(self, file_path, fingerprint):
+        """全部頁面寫入後記錄 begin_document 時的檔案指紋，之後 is_indexed 才會將檔案視為已索引。"""
+        size, mtime_ns, inode = fingerprint
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO text_documents (path, size, mtime_ns, inode, indexed_at) VALUES (?, ?, ?, ?, ?)",
+                (os.path.normpath(file_path), size, mtime_ns, inode, time.time())
+            )
+
+    def remove_missing(self, root_folder):
+        """移除 root_folder 之下已不存在的檔案的索引內容。"""
+        prefix = os.path.join(os.path.normpath(root_folder), '')
+        with self.lock:
+            paths = [row[0] for row in self.conn.execute(
+                "SELECT path FROM text_documents WHERE path LIKE ? ESCAPE '\\'", (escape_like(prefix) + '%',)
+            )]
+            missing = [(path,) for path in paths if not os.path.exists(path)]
+            if missing:
+                self.conn.executemany("DELETE FROM page_text WHERE path = ?", missing)
+                self.conn.executemany("DELETE FROM text_documents WHERE path = ?", missing)
+        return len(missing)
+
+    def search(self, text, limit=50):
+        """
+        搜尋包含指定文字的頁面，文字視為完整片語。
+        Returns:
+            list: [(檔案路徑, 頁碼, 摘要), ...]，依相關程度排序。
+        """
+        query = '"' + text.replace('"', '""') + '"'
+        with self.lock:
+            return self.conn.execute(
+                "SELECT path, page, snippet(page_text, 2, '[', ']', '…', 12) FROM page_text "
+                "WHERE page_text MATCH ? ORDER BY rank LIMIT ?", (query, limit)
+            ).fetchall()
+
+# 執行進度紀錄（中斷後接續）
+def folder_input_fingerprint(pdf_files):
+    """以銲道追溯 PDF 的路徑、大小與修改時間及擷取規則版本計算目標資料夾的輸入指紋。"""
+    entries = []
+    for file_path in sorted(pdf_files):
+        try:
+            stat = os.stat(file_path)
+            entries.append([file_path, stat.st_size, stat.st_mtime_ns])
+        except OSError:
+            entries.append([file_path, None, None])
+    payload = json.dumps([pdf_extraction_version(), entries], ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+class RunJournal:
+    """
+    執行進度紀錄類別，以 SQLite 記錄每個目標資料夾已完成的階段（extracted：已擷取編號；synced：已同步）
+    與當時的輸入指紋。接續執行時，輸入未變更且已同步（沒有未找到的編號）的資料夾直接略過，
+    只完成擷取的資料夾沿用記錄的編號繼續同步。目標資料夾一律以 os.path.normpath 形式作為鍵。
+    """
+    def __init__(self, journal_file=RUN_JOURNAL_FILE):
+        self.journal_file = journal_file
+        self.conn = connect_sqlite(journal_file)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS folder_stages ("
+            "target_folder TEXT PRIMARY KEY, fingerprint TEXT NOT NULL, stage TEXT NOT NULL, "
+            "codes TEXT NOT NULL, missing INTEGER NOT NULL, updated_at REAL NOT NULL)"
+        )
+
+    def reset(self, root_folder):
+        """清除 root_folder 之下所有目標資料夾的紀錄（重新開始完整執行時使用）。"""
+        root_folder = os.path.normpath(root_folder)
+        self.conn.execute(
+            "DELETE FROM folder_stages WHERE target_folder = ? OR target_folder LIKE ? ESCAPE '\\'",
+            (root_folder, escape_like(os.path.join(root_folder, '')) + '%')
+        )
+
+    def get(self, target_folder, fingerprint):
+        """
+        取得目標資料夾的紀錄，輸入指紋不符時返回 None。
+        Returns:
+            tuple: (階段, {PDF 檔案路徑: 編號字典}, 未找到的編號數)。
+        """
+        row = self.conn.execute(
+            "SELECT fingerprint, stage, codes, missing FROM folder_stages WHERE target_folder = ?",
+            (os.path.normpath(target_folder),)
+        ).fetchone()
+        if row is None or row[0] != fingerprint:
+            return None
+        return row[1], json.loads(row[2]), row[3]
+
+    def mark_extracted(self, target_folder, fingerprint, codes_by_file):
+        """記錄目標資料夾已完成編號擷取。"""
+        self.conn.execute(
+            "INSERT OR REPLACE INTO folder_stages (target_folder, fingerprint, stage, codes, missing, updated_at) "
+            "VALUES (?, ?, 'extracted', ?, 0, ?)",
+            (os.path.normpath(target_folder), fingerprint, json.dumps(codes_by_file, ensure_ascii=False), time.time())
+        )
+
+    def mark_synced(self, target_folder, fingerprint, missing):
+        """記錄目標資料夾已完成同步，以及仍未找到的編號數。"""
+        self.conn.execute(
+            "UPDATE folder_stages SET stage = 'synced', missing = ?, updated_at = ? WHERE target_folder = ? AND fingerprint = ?",
+            (missing, time.time(), os.path.normpath(target_folder), fingerprint)
+        )
 
 # 檔案操作相關函數
 def rename_file_if_needed(file_path, cache):
@@ -129,57 +1361,351 @@ def check_and_rename_files_in_folder(folder_path, cache):
                 new_file_path = future.result()
                 if new_file_path != file_path:
                     renamed_files.append((file_path, new_file_path))
+                    report_action('renamed', path=new_file_path, source=file_path)
             except Exception as e:
                 logging.error(f"錯誤處理檔案 {file_path}: {e}")
     return renamed_files
 
 # PDF 內容提取相關函數
-def get_ndt_codes_from_pdf(file_path, cache):
-    """從 PDF 中提取 NDT 編號，使用快取。"""
-    cached_data = cache.get_file_data(file_path)
-    if cached_data and 'ndt_codes' in cached_data:
-        return {code: f'CWP-Q-R-JK-NDT-{code}.pdf' for code in cached_data['ndt_codes']}
+def find_table_columns(words, layout):
+    """
+    依版面設定在頁面字詞中找出所有符合表頭的欄位。
+    Args:
+        words (list): page.get_text("words") 的結果。
+        layout (dict): WELDING_TABLE_LAYOUTS 中的版面設定。
+    Returns:
+        list: (欄位左界, 欄位右界, 表頭底部 y) 列表；只有恰好一個時才能確定要讀取的欄位。
+    """
+    if layout.get('x_range'):
+        return [(layout['x_range'][0], layout['x_range'][1], 0)]
+    header = re.compile(layout['header'])
+    margin = layout.get('x_margin', 0)
+    return [(x0 - margin, x1 + margin, y1) for x0, y0, x1, y1, word, *_ in words if header.search(word)]
+
+def words_to_text(words):
+    """將 page.get_text("words") 的結果依區塊與行組回頁面文字，同一頁不必再擷取一次純文字。"""
+    lines = []
+    current_line = None
+    for x0, y0, x1, y1, word, block_no, line_no, *_ in words:
+        if (block_no, line_no) != current_line:
+            lines.append([])
+            current_line = (block_no, line_no)
+        lines[-1].append(word)
+    return "".join(" ".join(line) + "\n" for line in lines)
+
+def read_table_column_codes(words, column, pattern):
+    """擷取欄位中（表頭以下、中心點落在欄位範圍內）符合正則表達式的字詞。"""
+    left, right, top = column
+    return {code for x0, y0, x1, y1, word, *_ in words
+            if y0 >= top and left <= (x0 + x1) / 2 <= right
+            for code in pattern.findall(word)}
+
+def scan_pdf_pages(doc, patterns, profile, page_text_sink=None):
+    """
+    逐頁掃描 PDF 文字並套用正則表達式，每頁文字使用後即丟棄，記憶體用量不隨頁數增加。
+    每頁最後一個未以空白結尾的字串會保留到下一頁一起比對，結果與整份文字串接後比對相同。
+    設定 table_columns 且範本已啟用的快取鍵改依字詞座標只讀取表格欄位（此時頁面文字由字詞組成，每頁只擷取一次）；
+    表頭不在本頁時沿用前一頁找到的欄位，找不到欄位或有多個表頭符合的頁面對該頁全文套用正則表達式，
+    column_only 中的快取鍵則不做全頁比對。
+    Args:
+        doc (fitz.Document): 已開啟的 PDF 文件。
+        patterns (dict): 快取鍵 -> 正則表達式。
+        profile (dict): PDF_SCAN_PROFILES 中的掃描設定。
+        page_text_sink (callable): 提供時每頁掃描後以 (頁碼（從 1 開始）, 頁面文字) 呼叫，供全文檢索索引逐頁寫入。
+    Returns:
+        dict: 快取鍵 -> 編號集合。
+    """
+    found = {key: set() for key in patterns}
+    start, stop = profile.get('pages') or (0, None)
+    stop = len(doc) if stop is None else min(stop, len(doc))
+    clip = fitz.Rect(*profile['clip']) if profile.get('clip') else None
+    stop_keys = profile.get('stop_when_found', ())
+    table_columns = {}
+    for key, layouts in (profile.get('table_columns') or {}).items():
+        enabled_layouts = [layout for layout in layouts.values() if layout.get('enabled')]
+        if key in patterns and enabled_layouts:
+            table_columns[key] = enabled_layouts
+    column_only = set(profile.get('column_only', ()))
+    text_patterns = {key: pattern for key, pattern in patterns.items()
+                     if key not in table_columns and key not in column_only}
+    columns = {}
+
+    def apply_patterns(text):
+        for key, pattern in text_patterns.items():
+            found[key].update(pattern.findall(text))
+
+    carry = ""
+    for page_number in range(start, stop):
+        page = doc.load_page(page_number)
+        if table_columns:
+            # 每頁只擷取一次字詞，頁面文字由字詞組成
+            words = page.get_text("words", clip=clip)
+            page_text = words_to_text(words)
+            for key, layouts in table_columns.items():
+                for layout in layouts:
+                    candidates = find_table_columns(words, layout)
+                    if len(candidates) == 1:
+                        columns[key] = candidates[0]
+                        break
+                    if candidates:
+                        # 多個表頭符合時無法確定欄位，此頁改為全頁比對，也不沿用前一頁的欄位
+                        logging.debug(f"第 {page_number + 1} 頁有 {len(candidates)} 個符合的表頭，改為全頁比對")
+                        columns.pop(key, None)
+                        break
+                else:
+                    if key in columns:
+                        left, right, _ = columns[key]
+                        columns[key] = (left, right, float('-inf'))
+                if key in columns:
+                    found[key].update(read_table_column_codes(words, columns[key], patterns[key]))
+                elif key not in column_only:
+                    found[key].update(patterns[key].findall(page_text))
+        else:
+            page_text = page.get_text(clip=clip)
+        if page_text_sink is not None:
+            page_text_sink(page_number + 1, page_text)
+        text = carry + page_text
+        cut = RE_TRAILING_TOKEN.search(text).start()
+        if len(text) - cut > PDF_SCAN_MAX_CARRY:
+            cut = len(text)
+        apply_patterns(text[:cut])
+        carry = text[cut:]
+        if stop_keys and all(found[key] for key in stop_keys):
+            logging.debug(f"已找到所需編號，於第 {page_number + 1} 頁停止掃描")
+            break
+    if carry:
+        apply_patterns(carry)
+    return found
+
+def open_pdf_document(file_path):
+    """
+    以一次循序讀取將 PDF 讀入記憶體後交給 PyMuPDF 解析，避免在網路磁碟上反覆隨機讀取；
+    超過 MMAP_THRESHOLD_BYTES 的檔案直接由 PyMuPDF 開啟。
+    """
+    buffer, stat = read_file_buffer(file_path)
+    if not isinstance(buffer, bytes):
+        buffer.close()
+        return fitz.open(file_path)
+    return fitz.open(stream=buffer, filetype='pdf')
 
-    codes_with_filenames = {}
+def read_codes_from_pdf(file_path, doc_type='welding_summary', page_text_sink=None):
+    """
+    開啟 PDF 一次，依文件類型的掃描設定逐頁套用該類型（PDF_DOC_TYPE_PATTERNS）的所有正則表達式，不使用快取。
+    提供 page_text_sink 時，每頁掃描後將頁面文字交給它（見 scan_pdf_pages）。
+    Returns:
+        dict: 快取鍵 -> 編號列表。
+    """
+    doc = open_pdf_document(file_path)
     try:
-        doc = fitz.open(file_path)
-        text = "".join(page.get_text() for page in doc)
+        found = scan_pdf_pages(doc, PDF_DOC_TYPE_PATTERNS[doc_type], PDF_SCAN_PROFILES[doc_type], page_text_sink)
+    finally:
         doc.close()
-
-        matches = RE_NDT_CODE.findall(text)
-        if matches:
-            codes_with_filenames = {code: f'CWP-Q-R-JK-NDT-{code}.pdf' for code in matches}
-            logging.info(f"從 {file_path} 提取到 NDT 編號: {matches}")
+    return {key: sorted(codes) for key, codes in found.items()}
+
+def log_extracted_codes(file_path, codes):
+    """記錄從 PDF 提取到的編號。"""
+    for key, values in codes.items():
+        label = CODE_LABELS.get(key, key)
+        if values:
+            logging.info(f"從 {file_path} 提取到{label}: {values}")
         else:
-            logging.info(f"從 {file_path} 未提取到任何 NDT 編號。")
-        cache.update_file_data(file_path, {'ndt_codes': matches})
-    except Exception as e:
-        logging.error(f"無法讀取 PDF 檔案 {file_path}: {e}")
-    return codes_with_filenames
+            logging.info(f"從 {file_path} 未提取到任何{label}。")
 
-def get_welding_codes_from_pdf(file_path, cache):
-    """從 PDF 中提取焊材材證編號，使用快取。"""
+def pdf_extraction_version():
+    """
+    擷取結果的版本：PDF_EXTRACTION_VERSION 加上各文件類型實際生效的掃描設定（正則表達式、頁碼範圍、clip
+    與已啟用的欄位版面）的雜湊。開啟或修改欄位範本時，快取的擷取結果與執行進度紀錄的輸入指紋都會隨之失效。
+    """
+    settings = {}
+    for doc_type, profile in PDF_SCAN_PROFILES.items():
+        settings[doc_type] = {
+            'patterns': {key: [pattern.pattern, pattern.flags] for key, pattern in PDF_DOC_TYPE_PATTERNS[doc_type].items()},
+            'profile': {name: value for name, value in profile.items() if name != 'table_columns'},
+            'table_columns': {key: [layout for layout in layouts.values() if layout.get('enabled')]
+                              for key, layouts in (profile.get('table_columns') or {}).items()},
+        }
+    digest = hashlib.sha256(json.dumps(settings, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+    return f"{PDF_EXTRACTION_VERSION}-{digest[:16]}"
+
+def get_cached_codes(file_path, cache, patterns=PDF_CODE_PATTERNS):
+    """取得檔案快取中完整的編號擷取結果，缺少任一鍵或擷取版本（pdf_extraction_version）不同時返回 None。"""
     cached_data = cache.get_file_data(file_path)
-    if cached_data and 'welding_codes' in cached_data:
-        return set(cached_data['welding_codes'])
+    if (cached_data and cached_data.get('extraction_version') == pdf_extraction_version()
+            and all(key in cached_data for key in patterns)):
+        return {key: cached_data[key] for key in patterns}
+    return None
 
-    codes = set()
-    try:
-        doc = fitz.open(file_path)
-        text = "".join(page.get_text() for page in doc)
-        doc.close()
+def extract_codes_from_pdf(file_path, cache):
+    """
+    開啟 PDF 一次並套用 PDF_CODE_PATTERNS 中的所有正則表達式，結果一併寫入同一筆快取。
+    Args:
+        file_path (str): PDF 檔案路徑。
+        cache (FileCache): 檔案快取。
+    Returns:
+        dict: 快取鍵 -> 編號列表。
+    """
+    cached_codes = get_cached_codes(file_path, cache)
+    if cached_codes is not None:
+        return cached_codes
 
-        matches = RE_WELDING_CODE.findall(text)
-        if matches:
-            codes = set(matches)
-            logging.info(f"從 {file_path} 提取到焊材材證編號: {matches}")
-        else:
-            logging.info(f"從 {file_path} 未提取到任何焊材材證編號。")
-        cache.update_file_data(file_path, {'welding_codes': list(codes)})
+    codes = {key: [] for key in PDF_CODE_PATTERNS}
+    try:
+        codes = read_codes_from_pdf(file_path)
+        log_extracted_codes(file_path, codes)
+        cache.update_file_data(file_path, dict(codes, extraction_version=pdf_extraction_version()))
     except Exception as e:
         logging.error(f"無法讀取 PDF 檔案 {file_path}: {e}")
     return codes
 
+_worker_text_index = None  # 工作程序各自開啟的全文檢索索引連線，由 _init_pdf_worker 設定
+
+def _init_pdf_worker(text_index_file=None):
+    """
+    擷取工作程序初始化：預先載入 PyMuPDF，並降低日誌層級（結果由主程序記錄）。
+    提供 text_index_file 時開啟全文檢索索引，頁面文字由工作程序直接逐頁寫入，不傳回主程序。
+    """
+    global _worker_text_index
+    import fitz  # noqa: F401
+    logging.getLogger().setLevel(logging.WARNING)
+    if text_index_file:
+        _worker_text_index = PdfTextIndex(text_index_file)
+
+def _read_codes_and_index_pages(file_path, doc_type):
+    """
+    在工作程序中擷取一份 PDF 的編號；工作程序開啟了全文檢索索引時，每頁文字讀出後立即寫入索引。
+    索引寫入失敗只記錄錯誤，不影響編號擷取（該檔案未完成索引，下次執行會重新擷取）。
+    """
+    text_index = _worker_text_index
+    fingerprint = None
+    if text_index is not None:
+        try:
+            fingerprint = text_index.begin_document(file_path)
+        except Exception as e:
+            logging.error(f"無法更新全文檢索索引 {file_path}: {e}")
+    if fingerprint is None:
+        return read_codes_from_pdf(file_path, doc_type)
+
+    index_errors = []
+
+    def index_page(page, text):
+        if index_errors:
+            return
+        try:
+            text_index.add_page(file_path, page, text)
+        except Exception as e:
+            index_errors.append(e)
+            logging.error(f"無法更新全文檢索索引 {file_path}: {e}")
+
+    codes = read_codes_from_pdf(file_path, doc_type, index_page)
+    if not index_errors:
+        try:
+            text_index.finish_document(file_path, fingerprint)
+        except Exception as e:
+            logging.error(f"無法更新全文檢索索引 {file_path}: {e}")
+    return codes
+
+def _read_codes_from_pdf_chunk(file_paths, doc_type='welding_summary'):
+    """
+    在工作程序中擷取一批 doc_type 類型 PDF 的編號。頁面文字不隨結果傳回，記憶體用量不隨批次大小增加。
+    Returns:
+        list: [(檔案路徑, 編號字典或 None, 錯誤訊息或 None), ...]
+    """
+    results = []
+    for file_path in file_paths:
+        try:
+            results.append((file_path, _read_codes_and_index_pages(file_path, doc_type), None))
+        except Exception as e:
+            results.append((file_path, None, str(e)))
+    return results
+
+class PdfExtractionPool:
+    """
+    PDF 編號擷取工作程序池，整次執行共用。PyMuPDF 擷取文字主要受 GIL 限制，
+    因此以多個工作程序取代執行緒；工作程序在第一次有快取未命中時才啟動。
+    提供 text_index 時，工作程序擷取時將讀出的頁面文字逐頁寫入同一個全文檢索索引檔；
+    尚未建立索引的檔案即使快取命中也會重新擷取。
+    """
+    def __init__(self, max_workers=PDF_EXTRACTION_WORKERS, chunk_size=PDF_EXTRACTION_CHUNK_SIZE, text_index=None):
+        self.max_workers = max_workers
+        self.chunk_size = chunk_size
+        self.text_index = text_index
+        self.executor = None
+        self.lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.shutdown()
+
+    def _get_executor(self):
+        with self.lock:
+            if self.executor is None:
+                text_index_file = self.text_index.index_file if self.text_index is not None else None
+                self.executor = ProcessPoolExecutor(max_workers=self.max_workers, initializer=_init_pdf_worker,
+                                                    initargs=(text_index_file,))
+                logging.info(f"已啟動 PDF 擷取工作程序池，工作程序數: {self.max_workers}")
+            return self.executor
+
+    def shutdown(self):
+        """關閉工作程序池。"""
+        with self.lock:
+            if self.executor is not None:
+                self.executor.shutdown()
+                self.executor = None
+
+    def extract(self, file_paths, cache, doc_type='welding_summary'):
+        """
+        擷取多個 doc_type 類型 PDF 的編號。快取命中的檔案直接返回，其餘分批送入工作程序，
+        結果完成即逐筆返回並寫入快取。
+        Yields:
+            tuple: (檔案路徑, 編號字典)。讀取失敗的檔案返回 None，不寫入快取，由呼叫端將所屬資料夾視為失敗。
+        """
+        patterns = PDF_DOC_TYPE_PATTERNS[doc_type]
+        pending = []
+        for file_path in file_paths:
+            cached_codes = get_cached_codes(file_path, cache, patterns)
+            if cached_codes is not None and (self.text_index is None or self.text_index.is_indexed(file_path)):
+                yield file_path, cached_codes
+            else:
+                pending.append(file_path)
+        if not pending:
+            return
+
+        executor = self._get_executor()
+        futures = {
+            executor.submit(_read_codes_from_pdf_chunk, pending[i:i + self.chunk_size], doc_type):
+                pending[i:i + self.chunk_size]
+            for i in range(0, len(pending), self.chunk_size)
+        }
+        for future in as_completed(futures):
+            try:
+                results = future.result()
+            except Exception as e:
+                logging.error(f"PDF 擷取工作失敗 {futures[future]}: {e}")
+                results = [(file_path, None, str(e)) for file_path in futures[future]]
+            for file_path, codes, error in results:
+                if codes is None:
+                    logging.error(f"無法讀取 PDF 檔案 {file_path}: {error}")
+                    report_action('pdf_read_failed', path=file_path, detail=error)
+                    yield file_path, None
+                    continue
+                log_extracted_codes(file_path, codes)
+                cache.update_file_data(file_path, dict(codes, extraction_version=pdf_extraction_version()))
+                yield file_path, codes
+
+def ndt_codes_with_filenames(ndt_codes):
+    """將 NDT 編號轉換為 {編號: 報驗單檔名}。"""
+    return {code: f'CWP-Q-R-JK-NDT-{code}.pdf' for code in ndt_codes}
+
+def get_ndt_codes_from_pdf(file_path, cache):
+    """從 PDF 中提取 NDT 編號，使用快取。"""
+    return ndt_codes_with_filenames(extract_codes_from_pdf(file_path, cache)['ndt_codes'])
+
+def get_welding_codes_from_pdf(file_path, cache):
+    """從 PDF 中提取焊材材證編號，使用快取。"""
+    return set(extract_codes_from_pdf(file_path, cache)['welding_codes'])
+
 # 資料夾判斷與處理函數
 def is_target_folder(folder_name):
     """判斷是否為目標資料夾。"""
@@ -187,148 +1713,259 @@ def is_target_folder(folder_name):
 
 def extract_base_folder_name(folder_name):
     """從資料夾名稱中提取基本名稱。"""
-    match = RE_BASE_FOLDER_NAME.search(folder_name)
-    return match.group(1) if match else folder_name
+    match = RE_TARGET_FOLDER.search(folder_name)
+    return match.group(0) if match else folder_name
+
+def find_summary_pdf_files(folder, is_as_built, mismatch_policy=FOLDER_MISMATCH_POLICY):
+    """
+    找出目標資料夾中銲道追溯資料夾內的 PDF 檔案。資料夾名稱先以 qc_schema 的標準名稱與已知別名查表，
+    都不符時才以相似度比對，再依 mismatch_policy 處理（竣工模式不重新命名，一律使用相似資料夾或建立資料夾）。
+    只有 mismatch_policy 為 prompt 時才顯示詢問對話框；選擇取消時略過該目標資料夾，不會終止整次執行。
+    Returns:
+        list: PDF 檔案路徑列表。資料夾名稱不符且依處理方式略過時返回 None。
+    """
+    schema = get_folder_schema(is_as_built)
+    target_folder_name = schema.folder_name('welding_summary')
+    try:
+        dirs = [entry.name for entry in os.scandir(folder) if entry.is_dir()]
+    except OSError:
+        return []
+
+    similar_folder, match_kind = schema.find('welding_summary', dirs)
+    if match_kind == 'exact':
+        summary_folder_name = target_folder_name
+    elif match_kind is not None:
+        if is_as_built:
+            response = False  # AS BUILT 模式不主動重新命名
+        elif match_kind == 'alias' and mismatch_policy != 'prompt':
+            response = mismatch_policy == 'rename'  # 非詢問模式下，已知的舊名稱不會略過
+        elif mismatch_policy == 'prompt':
+            response = messagebox.askyesnocancel(
+                "資料夾名稱不符",
+                f"未找到 '{target_folder_name}' 資料夾，但找到相似的資料夾 '{similar_folder}'。\n"
+                f"是否要將 '{similar_folder}' 重新命名為 '{target_folder_name}'？\n"
+                f"選擇「是」將重命名資料夾，選擇「否」將使用現有資料夾而不重命名，選擇「取消」將略過此目標資料夾。"
+            )
+        else:
+            response = {'rename': True, 'use_existing': False}.get(mismatch_policy)
+        if response is True:
+            os.rename(os.path.join(folder, similar_folder), os.path.join(folder, target_folder_name))
+            summary_folder_name = target_folder_name
+            logging.info(f"資料夾已重新命名: {similar_folder} -> {target_folder_name}")
+        elif response is False:
+            summary_folder_name = similar_folder
+            logging.info(f"使用現有相似資料夾: {similar_folder}")
+        else:
+            logging.warning(f"未找到 '{target_folder_name}' 資料夾（相似資料夾: {similar_folder}），略過: {folder}")
+            report_action('folder_mismatch_skipped', folder=folder, detail=similar_folder)
+            return None
+    else:
+        if is_as_built:
+            response = True
+        elif mismatch_policy == 'prompt':
+            response = messagebox.askyesno(
+                "資料夾名稱不符",
+                f"未找到 '{target_folder_name}' 資料夾。\n是否要建立該資料夾？"
+            )
+        else:
+            response = mismatch_policy != 'skip'
+        if not response:
+            logging.warning(f"未找到 '{target_folder_name}' 資料夾，略過: {folder}")
+            report_action('folder_mismatch_skipped', folder=folder)
+            return None
+        os.makedirs(os.path.join(folder, target_folder_name), exist_ok=True)
+        summary_folder_name = target_folder_name
+        logging.info(f"已建立資料夾: {target_folder_name}")
+
+    summary_folder = os.path.join(folder, summary_folder_name)
+    logging.info(f"處理資料夾: {summary_folder}")
+    return [os.path.join(summary_folder, f) for f in os.listdir(summary_folder)
+            if f.endswith('.pdf') and not f.startswith('~$')]
 
-def process_pdf_files_in_folder(folder, is_as_built, cache):
+def process_pdf_files_in_folder(folder, is_as_built, cache, extraction_pool=None):
     """處理指定資料夾中的 PDF 檔案，提取 NDT 和焊材材證編號。"""
     ndt_codes_with_filenames_total = {}
     welding_codes_total = set()
-    target_folder_name = SUMMARY_FOLDER_NAME_AS_BUILT if is_as_built else SUMMARY_FOLDER_NAME_GENERAL
-
-    for root, dirs, files in os.walk(folder):
-        if target_folder_name not in dirs:
-            close_matches = get_close_matches(target_folder_name, dirs, n=1, cutoff=0.6)
-            if close_matches:
-                similar_folder = close_matches[0]
-                if not is_as_built:
-                    response = messagebox.askyesnocancel(
-                        "資料夾名稱不符",
-                        f"未找到 '{target_folder_name}' 資料夾，但找到相似的資料夾 '{similar_folder}'。\n"
-                        f"是否要將 '{similar_folder}' 重新命名為 '{target_folder_name}'？\n"
-                        f"選擇「是」將重命名資料夾，選擇「否」將使用現有資料夾而不重命名，選擇「取消」將終止程序。"
-                    )
-                    if response is True:
-                        os.rename(os.path.join(root, similar_folder), os.path.join(root, target_folder_name))
-                        dirs[dirs.index(similar_folder)] = target_folder_name
-                        logging.info(f"資料夾已重新命名: {similar_folder} -> {target_folder_name}")
-                    elif response is False:
-                        target_folder_name = similar_folder
-                        logging.info(f"使用現有相似資料夾: {similar_folder}")
-                    else:
-                        messagebox.showwarning("警告", f"未找到 '{target_folder_name}' 資料夾，程序將終止執行。")
-                        raise SystemExit
-                else:
-                    target_folder_name = similar_folder  # AS BUILT 模式不主動重新命名
-            else:
-                if not is_as_built:
-                    response = messagebox.askyesno(
-                        "資料夾名稱不符",
-                        f"未找到 '{target_folder_name}' 資料夾。\n是否要建立該資料夾？"
-                    )
-                    if response:
-                        os.makedirs(os.path.join(root, target_folder_name), exist_ok=True)
-                        dirs.append(target_folder_name)
-                        logging.info(f"已建立資料夾: {target_folder_name}")
-                    else:
-                        messagebox.showwarning("警告", f"未找到 '{target_folder_name}' 資料夾，程序將終止執行。")
-                        raise SystemExit
-                else:
-                    os.makedirs(os.path.join(root, target_folder_name), exist_ok=True)
-                    dirs.append(target_folder_name)
-                    logging.info(f"已建立資料夾: {target_folder_name}")
-
-        summary_folder = os.path.join(root, target_folder_name)
-        logging.info(f"處理資料夾: {summary_folder}")
-
-        pdf_files = [os.path.join(summary_folder, f) for f in os.listdir(summary_folder)
-                     if f.endswith('.pdf') and not f.startswith('~$')]
-
-        with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
-            ndt_futures = {executor.submit(get_ndt_codes_from_pdf, file_path, cache): file_path for file_path in pdf_files}
-            welding_futures = {executor.submit(get_welding_codes_from_pdf, file_path, cache): file_path for file_path in pdf_files}
-
-            for future in as_completed(ndt_futures):
-                file_path = ndt_futures[future]
-                try:
-                    ndt_codes = future.result()
-                    ndt_codes_with_filenames_total.update(ndt_codes)
-                except Exception as e:
-                    logging.error(f"錯誤提取 NDT 編號從檔案 {file_path}: {e}")
+    pdf_files = find_summary_pdf_files(folder, is_as_built)
 
-            for future in as_completed(welding_futures):
-                file_path = welding_futures[future]
-                try:
-                    welding_codes = future.result()
-                    welding_codes_total.update(welding_codes)
-                except Exception as e:
-                    logging.error(f"錯誤提取焊材材證編號從檔案 {file_path}: {e}")
-        break
+    if extraction_pool is None:
+        with PdfExtractionPool() as pool:
+            results = list(pool.extract(pdf_files, cache))
+    else:
+        results = extraction_pool.extract(pdf_files, cache)
+    for file_path, codes in results:
+        if codes is None:
+            # 不以空的編號繼續同步，否則目標資料夾中既有的報驗單與焊材材證會被視為不再引用而刪除
+            raise OSError(f"無法讀取銲道追溯 PDF: {file_path}")
+        ndt_codes_with_filenames_total.update(ndt_codes_with_filenames(codes['ndt_codes']))
+        welding_codes_total.update(codes['welding_codes'])
     return ndt_codes_with_filenames_total, welding_codes_total
 
 # 檔案搜尋與複製函數
-def search_and_copy_ndt_pdfs(source_folder, target_folder, codes_with_filenames, is_as_built, cache):
-    """搜尋並複製 NDT PDF 檔案，避免複製「作廢」版本。"""
+def is_file_up_to_date(source_file_path, target_file_path, file_buffers=None):
+    """
+    以大小與修改時間判斷目標檔案是否與來源相同（shutil.copy2 會保留修改時間）。
+    提供 file_buffers 時，來源 stat 在單次執行內只查詢一次。
+    """
+    try:
+        source_stat = file_buffers.stat(source_file_path) if file_buffers else os.stat(source_file_path)
+        target_stat = os.stat(target_file_path)
+    except OSError:
+        return False
+    return (source_stat.st_size == target_stat.st_size
+            and abs(source_stat.st_mtime - target_stat.st_mtime) <= MTIME_TOLERANCE_SECONDS)
+
+def reconcile_pdf_folder(target_folder_path, desired_files, file_label, cert_store=None, source_mirror=None,
+                         file_buffers=None):
+    """
+    同步目標資料夾中的 PDF 檔案：只複製新增或變更的檔案，只刪除不再被引用的檔案。
+    Args:
+        target_folder_path (str): 目標資料夾路徑。
+        desired_files (dict): 目標檔名 -> 來源檔案路徑。
+        file_label (str): 日誌中使用的檔案類別名稱。
+        cert_store (CertificateStore): 證書存放區，提供時經由存放區放入檔案。
+        source_mirror (SourceMirror): 來源檔案本機鏡像，提供時從本機副本比對與複製。
+        file_buffers (RunFileBuffers): 單次執行檔案緩衝區，同一來源檔案複製到多個資料夾時只讀取一次。
+    Returns:
+        set: 同步完成（已複製或原本即為最新）的目標檔名。
+    """
+    os.makedirs(target_folder_path, exist_ok=True)
+    ready_files = set()
     copied_files = 0
+    deleted_files = 0
+
+    existing_files = {f for f in os.listdir(target_folder_path) if f.endswith('.pdf') and not f.startswith('~$')}
+    for file_name in existing_files - desired_files.keys():
+        file_path = os.path.join(target_folder_path, file_name)
+        try:
+            os.remove(file_path)
+            deleted_files += 1
+            logging.info(f"已刪除不再引用的{file_label}檔案: {file_path}")
+            report_action('deleted_unreferenced', folder=target_folder_path, path=file_path)
+        except Exception as e:
+            logging.error(f"無法刪除檔案 {file_path}: {e}")
+
+    for file_name, source_file_path in desired_files.items():
+        # 使用本機鏡像時，複製完成前該副本不會被淘汰
+        with source_mirror.use(source_file_path) if source_mirror else nullcontext(source_file_path) as source_file_path:
+            target_file_path = os.path.join(target_folder_path, file_name)
+            if file_name in existing_files and is_file_up_to_date(source_file_path, target_file_path, file_buffers):
+                ready_files.add(file_name)
+                continue
+            try:
+                if cert_store:
+                    cert_store.materialize(source_file_path, target_file_path)
+                elif file_buffers:
+                    file_buffers.write_to(source_file_path, target_file_path)
+                else:
+                    shutil.copy2(source_file_path, target_file_path)
+                copied_files += 1
+                ready_files.add(file_name)
+                logging.info(f"已複製{file_label}檔案: {source_file_path} -> {target_file_path}")
+                report_action('copied', folder=target_folder_path, path=target_file_path, source=source_file_path)
+            except Exception as e:
+                logging.error(f"無法複製檔案 {source_file_path} 到 {target_file_path}: {e}")
+                report_action('copy_failed', folder=target_folder_path, path=target_file_path, source=source_file_path,
+                              detail=str(e))
+
+    logging.info(f"{file_label.strip()}同步完成: {target_folder_path}，複製 {copied_files} 份，"
+                 f"未變更 {len(ready_files) - copied_files} 份，刪除 {deleted_files} 份")
+    return ready_files
+
+def search_and_copy_ndt_pdfs(source_folder, target_folder, codes_with_filenames, is_as_built, cache, ndt_index=None, cert_store=None,
+                             source_mirror=None, file_buffers=None):
+    """
+    搜尋並同步 NDT PDF 檔案，避免複製「作廢」版本。未提供報驗單索引時會載入並更新索引。
+    Returns:
+        tuple: (同步完成的檔案數, 未找到的報驗單檔名集合)
+    """
     not_found_codes = set(codes_with_filenames.keys())
     target_folder_path = os.path.join(target_folder, NDT_REPORTS_FOLDER_AS_BUILT if is_as_built else NDT_REPORTS_FOLDER_GENERAL)
-    os.makedirs(target_folder_path, exist_ok=True)
 
-    ndt_files = {}
-    for root, _, files in os.walk(source_folder):
-        for file in files:
-            if file.endswith('.pdf') and not file.startswith('~$'):
-                match = re.search(r'CWP-Q-R-JK-NDT-(\d+)', file, re.IGNORECASE)
-                if match:
-                    ndt_code = match.group(1)
-                    is_cancelled = "作廢" in file
-                    if ndt_code not in ndt_files:
-                        ndt_files[ndt_code] = {'valid': None, 'cancelled': None}
-                    ndt_files[ndt_code]['cancelled' if is_cancelled else 'valid'] = os.path.join(root, file)
+    if ndt_index is None:
+        ndt_index = load_ndt_report_index(source_folder)
 
+    desired_files = {}
+    codes_by_name = {}
     for ndt_code in list(not_found_codes):
-        if ndt_code in ndt_files:
-            file_to_copy = ndt_files[ndt_code]['valid']
-            if file_to_copy:
-                target_file_path = os.path.join(target_folder_path, os.path.basename(file_to_copy))
-                try:
-                    shutil.copy2(file_to_copy, target_file_path)
-                    copied_files += 1
-                    not_found_codes.remove(ndt_code)
-                    logging.info(f"已複製 NDT 檔案: {file_to_copy} -> {target_file_path}")
-                except Exception as e:
-                    logging.error(f"無法複製檔案 {file_to_copy} 到 {target_file_path}: {e}")
-            elif ndt_files[ndt_code]['cancelled']:
-                logging.info(f"找到作廢的 NDT 檔案，但不複製: {ndt_files[ndt_code]['cancelled']}")
+        ndt_entry = ndt_index.lookup(ndt_code)
+        if ndt_entry:
+            if ndt_entry['valid']:
+                file_to_copy = ndt_entry['valid']['path']
+                desired_files[os.path.basename(file_to_copy)] = file_to_copy
+                codes_by_name.setdefault(os.path.basename(file_to_copy), []).append(ndt_code)
+            elif ndt_entry['cancelled']:
+                logging.info(f"找到作廢的 NDT 檔案，但不複製: {ndt_entry['cancelled']['path']}")
                 not_found_codes.remove(ndt_code)
 
+    ready_files = reconcile_pdf_folder(target_folder_path, desired_files, " NDT ", cert_store, source_mirror, file_buffers)
+    for file_name in ready_files:
+        not_found_codes.difference_update(codes_by_name[file_name])
+
     not_found_filenames = {codes_with_filenames[code] for code in not_found_codes}
-    return copied_files, not_found_filenames
+    return len(ready_files), not_found_filenames
 
-def search_and_copy_welding_pdfs(source_folder, target_folder, codes, is_as_built, cache):
-    """搜尋並複製焊材材證 PDF 檔案。"""
-    copied_files = 0
+def search_and_copy_welding_pdfs(source_folder, target_folder, codes, is_as_built, cache, welding_resolver=None, cert_store=None,
+                                 source_mirror=None, file_buffers=None):
+    """
+    搜尋並同步焊材材證 PDF 檔案。未提供材證解析器時會載入並更新材證檔名索引。
+    Returns:
+        tuple: (同步完成的檔案數, 未找到的焊材材證編號集合)
+    """
     not_found_codes = set(codes)
     target_subfolder = WELDING_CONSUMABLE_FOLDER_AS_BUILT if is_as_built else WELDING_CONSUMABLE_FOLDER_GENERAL
     target_folder_path = os.path.join(target_folder, target_subfolder)
-    os.makedirs(target_folder_path, exist_ok=True)
 
-    for root, _, files in os.walk(source_folder):
-        for file in files:
-            if file.endswith('.pdf') and not file.startswith('~$'):
-                for code in list(not_found_codes):
-                    if re.search(re.escape(code), file, re.IGNORECASE):
-                        source_file_path = os.path.join(root, file)
-                        target_file_path = os.path.join(target_folder_path, file)
-                        try:
-                            shutil.copy2(source_file_path, target_file_path)
-                            copied_files += 1
-                            not_found_codes.remove(code)
-                            logging.info(f"已複製焊材材證檔案: {source_file_path} -> {target_file_path}")
-                        except Exception as e:
-                            logging.error(f"無法複製檔案 {source_file_path} 到 {target_file_path}: {e}")
-                        break
-    return copied_files, not_found_codes
+    if welding_resolver is None:
+        welding_resolver = WeldingCertResolver(load_welding_cert_index(source_folder))
+
+    # 同一份材證可能對應多個編號，只複製一次
+    desired_files = {}
+    codes_by_name = {}
+    for code, source_file_path in welding_resolver.resolve(not_found_codes).items():
+        if source_file_path:
+            desired_files[os.path.basename(source_file_path)] = source_file_path
+            codes_by_name.setdefault(os.path.basename(source_file_path), []).append(code)
+
+    ready_files = reconcile_pdf_folder(target_folder_path, desired_files, "焊材材證", cert_store, source_mirror, file_buffers)
+    for file_name in ready_files:
+        not_found_codes.difference_update(codes_by_name[file_name])
+    return len(ready_files), not_found_codes
+
+def find_material_pdf_files(target_folder, is_as_built):
+    """找出目標資料夾中物料追溯資料夾（僅該層，不含鋼廠材證子資料夾）的 PDF 檔案。"""
+    material_folder = os.path.join(
+        target_folder, MATERIAL_TRACEABILITY_FOLDER_AS_BUILT if is_as_built else MATERIAL_TRACEABILITY_FOLDER_GENERAL
+    )
+    if not os.path.isdir(material_folder):
+        return []
+    return [os.path.join(material_folder, f) for f in os.listdir(material_folder)
+            if f.endswith('.pdf') and not f.startswith('~$') and os.path.isfile(os.path.join(material_folder, f))]
+
+def search_and_copy_mill_certs(target_folder, heat_numbers, is_as_built, mill_cert_resolver, cert_store=None,
+                               source_mirror=None, file_buffers=None):
+    """
+    依物料追溯清單中的爐號，將引用到的鋼廠材證同步到物料追溯資料夾的 Mill Cert 子資料夾。
+    Returns:
+        tuple: (同步完成的檔案數, 未找到的爐號集合)
+    """
+    not_found_heat_numbers = set(heat_numbers)
+    material_folder = MATERIAL_TRACEABILITY_FOLDER_AS_BUILT if is_as_built else MATERIAL_TRACEABILITY_FOLDER_GENERAL
+    target_folder_path = os.path.join(target_folder, material_folder, MILL_CERT_SUBFOLDER)
+
+    desired_files = {}
+    heat_numbers_by_name = {}
+    for heat_number, source_file_path in mill_cert_resolver.resolve(not_found_heat_numbers).items():
+        if source_file_path:
+            desired_files[os.path.basename(source_file_path)] = source_file_path
+            heat_numbers_by_name.setdefault(os.path.basename(source_file_path), []).append(heat_number)
+
+    ready_files = reconcile_pdf_folder(target_folder_path, desired_files, "鋼廠材證", cert_store, source_mirror, file_buffers)
+    for file_name in ready_files:
+        not_found_heat_numbers.difference_update(heat_numbers_by_name[file_name])
+    for heat_number in sorted(not_found_heat_numbers):
+        report_action('missing_mill_cert', folder=target_folder, code=heat_number)
+    return len(ready_files), not_found_heat_numbers
 
 # 檔案刪除函數
 def delete_all_welding_pdfs(target_folder, is_as_built):
@@ -366,8 +2003,8 @@ def delete_all_ndt_pdfs(target_folder, is_as_built):
                     logging.error(f"無法刪除檔案 {file_path}: {e}")
     return deleted_files
 
-def clean_unmatched_files(pdf_folder, is_as_built):
-    """清理不符合命名規則的檔案。"""
+def clean_unmatched_files(pdf_folder, is_as_built, show_errors=True):
+    """清理不符合命名規則的檔案。show_errors 為 False 時（非主執行緒）只記錄日誌，不顯示對話框。"""
     deleted_files = []
     try:
         folder_name = os.path.basename(pdf_folder)
@@ -399,7 +2036,10 @@ def clean_unmatched_files(pdf_folder, is_as_built):
         for subfolder in target_folders:
             subfolder_path = os.path.join(pdf_folder, subfolder)
             if os.path.exists(subfolder_path):
-                for root, _, files in os.walk(subfolder_path):
+                for root, dirs, files in os.walk(subfolder_path):
+                    # 鋼廠材證以來源檔名存放，不套用目標資料夾的命名規則
+                    if MILL_CERT_SUBFOLDER in dirs:
+                        dirs.remove(MILL_CERT_SUBFOLDER)
                     for file in files:
                         if file.endswith('.pdf') and not file.startswith('~$'):
                             file_path = os.path.join(root, file)
@@ -410,12 +2050,14 @@ def clean_unmatched_files(pdf_folder, is_as_built):
                                     os.remove(file_path)
                                     deleted_files.append(file_path)
                                     logging.info(f"已刪除檔案: {file_path}")
+                                    report_action('deleted_unmatched', folder=pdf_folder, path=file_path)
                                 except Exception as e:
                                     logging.error(f"處理檔案時發生錯誤 {file_path}: {str(e)}")
                     break
     except Exception as e:
         logging.error(f"處理資料夾時發生錯誤 {pdf_folder}: {str(e)}")
-        messagebox.showerror("錯誤", f"處理資料夾時發生錯誤：\n{str(e)}")
+        if show_errors:
+            messagebox.showerror("錯誤", f"處理資料夾時發生錯誤：\n{str(e)}")
     return deleted_files
 
 # 新增檢查函數：檢查目標資料夾底下是否存在 PDF 檔案
@@ -424,7 +2066,7 @@ def check_required_pdf_files(pdf_folder, is_as_built):
     檢查每個目標資料夾下的指定子資料夾是否存在 PDF 檔案。
     一般模式下，檢查「01 Welding Identification Summary」與「02 Material Traceability & Mill Cert」；
     竣工模式下，檢查「04 Welding Identification Summary」與「02 Material Traceability」。
-    對於物料追溯的資料夾僅檢查該層，不包含子資料夾。
+    對於物料追溯的資料夾僅檢查該層，不包含子資料夾。結果取自完整性稽核（使用目錄快照）。
     Returns:
         tuple: (缺少銲道追溯PDF的資料夾列表, 缺少物料追溯清單 PDF的資料夾列表)
     """
@@ -434,46 +2076,148 @@ def check_required_pdf_files(pdf_folder, is_as_built):
     # 依據模式選擇物料追溯資料夾名稱
     traceability_folder_name = MATERIAL_TRACEABILITY_FOLDER_AS_BUILT if is_as_built else MATERIAL_TRACEABILITY_FOLDER_GENERAL
 
-    def check_in_target_folder(target_folder):
-        welding_path = os.path.join(target_folder, welding_folder_name)
-        traceability_path = os.path.join(target_folder, traceability_folder_name)
-
-        # 檢查 Welding Identification (銲道追溯) 資料夾（遞迴搜尋）
-        welding_has_pdf = False
-        if os.path.exists(welding_path) and os.path.isdir(welding_path):
-            for root, dirs, files in os.walk(welding_path):
-                for file in files:
-                    if file.endswith('.pdf') and not file.startswith('~$'):
-                        welding_has_pdf = True
-                        break
-                if welding_has_pdf:
-                    break
-        if not welding_has_pdf:
-            missing_welding_identification.append(welding_path)
-
-        # 檢查 Material Traceability (物料追溯清單) 資料夾（僅檢查該層，不遞迴）
-        traceability_has_pdf = False
-        if os.path.exists(traceability_path) and os.path.isdir(traceability_path):
-            for file in os.listdir(traceability_path):
-                if file.endswith('.pdf') and not file.startswith('~$'):
-                    traceability_has_pdf = True
-                    break
-        if not traceability_has_pdf:
-            missing_material_traceability.append(traceability_path)
+    _, matrix = audit_package(pdf_folder)
+    for target_folder, statuses in matrix.items():
+        if statuses['銲道追溯']['status'] in ('missing', 'too_few'):
+            missing_welding_identification.append(os.path.join(target_folder, welding_folder_name))
+        if statuses['物料追溯']['status'] in ('missing', 'too_few'):
+            missing_material_traceability.append(os.path.join(target_folder, traceability_folder_name))
+    return missing_welding_identification, missing_material_traceability
+
+# 完整性稽核
+# 每個目標資料夾的稽核規則，依模式區分
+#   folder: 相對於目標資料夾的子資料夾
+#   min_files: 最少 PDF 數量
+#   recursive: True 時包含子資料夾中的 PDF
+#   name_pattern: 檔名須符合的正則表達式，{base} 會代入目標資料夾的基本名稱，None 表示不檢查
+#   references: 'ndt' / 'welding'，檢查反向索引中該類編號是否都已找到對應檔案
+AUDIT_RULES = {
+    'as_built': [
+        {'name': '銲道追溯', 'folder': SUMMARY_FOLDER_NAME_AS_BUILT, 'min_files': 1, 'recursive': True, 'name_pattern': '{base}'},
+        {'name': '物料追溯', 'folder': MATERIAL_TRACEABILITY_FOLDER_AS_BUILT, 'min_files': 1, 'recursive': False, 'name_pattern': '{base}'},
+        {'name': '報驗單', 'folder': NDT_REPORTS_FOLDER_AS_BUILT, 'min_files': 0, 'recursive': False,
+         'name_pattern': r'^CWP-Q-R-JK-NDT-\d+', 'references': 'ndt'},
+        {'name': '焊材材證', 'folder': WELDING_CONSUMABLE_FOLDER_AS_BUILT, 'min_files': 0, 'recursive': False, 'references': 'welding'},
+    ],
+    'general': [
+        {'name': '銲道追溯', 'folder': SUMMARY_FOLDER_NAME_GENERAL, 'min_files': 1, 'recursive': True, 'name_pattern': '{base}'},
+        {'name': '物料追溯', 'folder': MATERIAL_TRACEABILITY_FOLDER_GENERAL, 'min_files': 1, 'recursive': False, 'name_pattern': '{base}'},
+        {'name': '報驗單', 'folder': NDT_REPORTS_FOLDER_GENERAL, 'min_files': 0, 'recursive': False,
+         'name_pattern': r'^CWP-Q-R-JK-NDT-\d+', 'references': 'ndt'},
+        {'name': '焊材材證', 'folder': WELDING_CONSUMABLE_FOLDER_GENERAL, 'min_files': 0, 'recursive': False, 'references': 'welding'},
+    ],
+}
+
+class PackageTreeIndex(SourceTreeIndex):
+    """FAT package 目錄快照，記錄所有 PDF 檔案，依資料夾 mtime 增量更新，供完整性稽核使用。"""
+    def __init__(self, root_folder, index_file=PACKAGE_INDEX_FILE):
+        super().__init__(
+            root_folder, index_file,
+            file_filter=lambda file_name: file_name.endswith('.pdf') and not file_name.startswith('~$')
+        )
+
+    def list_files(self, rel_path, recursive=False):
+        """列出快照中某個資料夾的 PDF 檔名，資料夾不存在時返回 None。"""
+        entry = self.dirs.get(rel_path)
+        if entry is None:
+            return None
+        files = list(entry['files'])
+        if recursive:
+            for subdir in entry['subdirs']:
+                files.extend(self.list_files(os.path.join(rel_path, subdir) if rel_path else subdir, True) or [])
+        return files
+
+def evaluate_audit_rule(rule, files, base_folder_name, reference_counts):
+    """
+    依單一規則評估目標資料夾的狀態。
+    Returns:
+        dict: {'status': ok / missing / too_few / bad_names / unresolved, 'detail': 說明}
+    """
+    if files is None:
+        return {'status': 'missing', 'detail': rule['folder']}
+    if len(files) < rule.get('min_files', 0):
+        return {'status': 'too_few', 'detail': f"{len(files)}/{rule['min_files']}"}
+    if rule.get('name_pattern') and base_folder_name is not None:
+        pattern = re.compile(rule['name_pattern'].replace('{base}', re.escape(base_folder_name)), re.IGNORECASE)
+        bad_names = [file_name for file_name in files if not pattern.search(os.path.splitext(file_name)[0])]
+        if bad_names:
+            return {'status': 'bad_names', 'detail': format_samples(bad_names)}
+    if rule.get('references'):
+        total, unresolved = reference_counts.get(rule['references'], (0, 0))
+        if unresolved:
+            return {'status': 'unresolved', 'detail': f"{total - unresolved}/{total}"}
+    return {'status': 'ok', 'detail': ''}
+
+def audit_package(pdf_folder, reference_index=None):
+    """
+    以目錄快照與反向索引稽核 FAT package 的完整性，只重新列出 mtime 有變動的資料夾。
+    Returns:
+        tuple: (規則名稱列表, {目標資料夾: {規則名稱: 狀態字典}})
+    """
+    pdf_folder = os.path.normpath(pdf_folder)
+    is_as_built = "FOXWELL" in pdf_folder
+    rules = AUDIT_RULES['as_built' if is_as_built else 'general']
+    if reference_index is None:
+        reference_index = CodeReferenceIndex()
+
+    tree_index = PackageTreeIndex(pdf_folder)
+    tree_index.refresh()
+    tree_index.save_index()
 
     if is_target_folder(os.path.basename(pdf_folder)):
-        check_in_target_folder(pdf_folder)
+        target_rel_paths = ['']
     else:
-        for name in os.listdir(pdf_folder):
-            sub_path = os.path.join(pdf_folder, name)
-            if os.path.isdir(sub_path) and is_target_folder(name):
-                check_in_target_folder(sub_path)
-    return missing_welding_identification, missing_material_traceability
+        root_entry = tree_index.dirs.get('', {'subdirs': []})
+        target_rel_paths = [name for name in root_entry['subdirs'] if is_target_folder(name)]
+    reference_counts = reference_index.status_counts(pdf_folder)
+
+    matrix = {}
+    for target_rel_path in target_rel_paths:
+        target_folder = os.path.join(pdf_folder, target_rel_path) if target_rel_path else pdf_folder
+        base_folder_name = extract_base_folder_name(os.path.basename(target_folder))
+        matrix[target_folder] = {
+            rule['name']: evaluate_audit_rule(
+                rule,
+                tree_index.list_files(os.path.join(target_rel_path, rule['folder']) if target_rel_path else rule['folder'],
+                                      rule.get('recursive', False)),
+                base_folder_name,
+                reference_counts.get(target_folder, {})
+            )
+            for rule in rules
+        }
+    return [rule['name'] for rule in rules], matrix
+
+def print_audit(pdf_folder):
+    """輸出 FAT package 完整性稽核的狀態表。"""
+    start_time = time.perf_counter()
+    rule_names, matrix = audit_package(pdf_folder)
+    labels = {'ok': 'OK', 'missing': '缺資料夾', 'too_few': '檔案不足', 'bad_names': '檔名不符', 'unresolved': '未齊全'}
+    print("目標資料夾\t" + "\t".join(rule_names))
+    incomplete = 0
+    for target_folder, statuses in matrix.items():
+        cells = []
+        for rule_name in rule_names:
+            status = statuses[rule_name]
+            cells.append(labels[status['status']] + (f" ({status['detail']})" if status['detail'] and status['status'] != 'missing' else ""))
+        if any(status['status'] != 'ok' for status in statuses.values()):
+            incomplete += 1
+        print(os.path.basename(target_folder) + "\t" + "\t".join(cells))
+    print(f"共 {len(matrix)} 個目標資料夾，{incomplete} 個未完整（{time.perf_counter() - start_time:.2f} 秒）")
 
 # 單一資料夾處理函數
-def process_single_folder(pdf_folder, ndt_source_pdf_folder, welding_source_pdf_folder, is_as_built, cache):
-    """處理單一資料夾中的所有操作。"""
-    ndt_codes_with_filenames_total, welding_codes_total = process_pdf_files_in_folder(pdf_folder, is_as_built, cache)
+def process_single_folder(pdf_folder, ndt_source_pdf_folder, welding_source_pdf_folder, is_as_built, cache,
+                          ndt_index=None, welding_resolver=None, extracted_codes=None, reconcile=RECONCILE_TARGET_FOLDERS,
+                          show_errors=True, cert_store=None, source_mirror=None, file_buffers=None,
+                          heat_numbers=None, mill_cert_resolver=None):
+    """
+    處理單一資料夾中的所有操作。extracted_codes 為已擷取的 (NDT 編號與檔名, 焊材材證編號)，未提供時重新擷取。
+    reconcile 為 True 時只同步有差異的報驗單與焊材材證，否則先刪除全部再重新複製。
+    提供 mill_cert_resolver 時，依 heat_numbers（物料追溯清單中的爐號）同步鋼廠材證。
+    於背景執行緒執行時 show_errors 應為 False。
+    """
+    if extracted_codes is None:
+        extracted_codes = process_pdf_files_in_folder(pdf_folder, is_as_built, cache)
+    ndt_codes_with_filenames_total, welding_codes_total = extracted_codes
     reasons = []
 
     if not ndt_codes_with_filenames_total:
@@ -481,83 +2225,382 @@ def process_single_folder(pdf_folder, ndt_source_pdf_folder, welding_source_pdf_
     if not welding_codes_total:
         reasons.append("沒有在 PDF 中找到任何符合條件的焊材材證編號。")
 
-    delete_all_ndt_pdfs(pdf_folder, is_as_built)
-    delete_all_welding_pdfs(pdf_folder, is_as_built)
+    if not reconcile:
+        delete_all_ndt_pdfs(pdf_folder, is_as_built)
+        delete_all_welding_pdfs(pdf_folder, is_as_built)
 
     ndt_copied, not_found_ndt_filenames = search_and_copy_ndt_pdfs(
-        ndt_source_pdf_folder, pdf_folder, ndt_codes_with_filenames_total, is_as_built, cache
+        ndt_source_pdf_folder, pdf_folder, ndt_codes_with_filenames_total, is_as_built, cache, ndt_index, cert_store, source_mirror,
+        file_buffers
     )
     if ndt_copied == 0 and ndt_codes_with_filenames_total:
         reasons.append("找到了 NDT 編號，但沒有找到對應的報驗單 PDF 檔案。")
 
     welding_copied, not_found_welding_codes = search_and_copy_welding_pdfs(
-        welding_source_pdf_folder, pdf_folder, welding_codes_total, is_as_built, cache
+        welding_source_pdf_folder, pdf_folder, welding_codes_total, is_as_built, cache, welding_resolver, cert_store, source_mirror,
+        file_buffers
     )
     if welding_copied == 0 and welding_codes_total:
         reasons.append("找到了焊材材證編號，但沒有找到對應的焊材材證 PDF 檔案。")
 
-    deleted_files = clean_unmatched_files(pdf_folder, is_as_built)
+    if mill_cert_resolver is not None and heat_numbers:
+        mill_certs_copied, not_found_heat_numbers = search_and_copy_mill_certs(
+            pdf_folder, heat_numbers, is_as_built, mill_cert_resolver, cert_store, source_mirror, file_buffers
+        )
+        logging.info(f"鋼廠材證: {pdf_folder} 同步 {mill_certs_copied} 份，未找到 {len(not_found_heat_numbers)} 個爐號")
+
+    deleted_files = clean_unmatched_files(pdf_folder, is_as_built, show_errors)
 
     return ndt_copied, welding_copied, not_found_ndt_filenames, not_found_welding_codes, reasons, deleted_files
 
+def report_folder_result(target_folder, result):
+    """將單一目標資料夾的處理結果（未找到的編號、未同步的原因與檔案數）寫入執行報告。"""
+    ndt_copied, welding_copied, not_found_ndt_filenames, not_found_welding_codes, reasons, deleted_files = result
+    for file_name in sorted(not_found_ndt_filenames):
+        report_action('missing_ndt', folder=target_folder, code=file_name)
+    for code in sorted(not_found_welding_codes):
+        report_action('missing_welding', folder=target_folder, code=code)
+    for reason in reasons:
+        report_action('reason', folder=target_folder, detail=reason)
+    report_action('folder_done', folder=target_folder,
+                  detail={'ndt_copied': ndt_copied, 'welding_copied': welding_copied, 'deleted': len(deleted_files)})
+
 # 多個資料夾處理函數
-def process_folders(pdf_folder, ndt_source_pdf_folder, welding_source_pdf_folder, cache):
-    """處理所有目標資料夾。"""
+def find_target_folders(pdf_folder):
+    """
+    找出要處理的目標資料夾：所選資料夾本身，或其第一層中符合命名規則的子資料夾。
+    返回的路徑一律經過 os.path.normpath，反向索引、全文檢索索引與執行進度紀錄都以此形式記錄目標資料夾
+    （askdirectory 返回的路徑在 Windows 上使用 '/'，與 os.path.join 的 '\\' 混用時無法以前綴比對）。
+    """
+    pdf_folder = os.path.normpath(pdf_folder)
+    if is_target_folder(os.path.basename(pdf_folder)):
+        return [pdf_folder]
+    target_folders = []
+    for root, dirs, _ in os.walk(pdf_folder):
+        for dir in dirs:
+            if is_target_folder(dir):
+                target_folders.append(os.path.join(root, dir))
+        break  # 僅處理第一層子資料夾
+    return target_folders
+
+def iter_extracted_folders(pdf_files_by_folder, cache, extraction_pool, journaled_codes=None):
+    """
+    將所有目標資料夾的銲道追溯 PDF 一併送入擷取工作程序池，某個資料夾的 PDF 全部完成時即返回該資料夾。
+    Args:
+        pdf_files_by_folder (dict): 目標資料夾 -> PDF 檔案路徑列表。
+        journaled_codes (dict): 目標資料夾 -> 執行進度紀錄中的 {PDF 檔案路徑: 編號字典}，這些資料夾不重新擷取並最先返回。
+    Yields:
+        tuple: (目標資料夾, (NDT 編號與檔名, 焊材材證編號集合), {PDF 檔案路徑: 編號字典}, 無法讀取的 PDF 列表)。
+            無法讀取的 PDF 列表不為空時，編號只涵蓋其餘的 PDF，該資料夾不應記錄或同步。
+    """
+    for target_folder, folder_codes_by_file in (journaled_codes or {}).items():
+        ndt_codes_with_filenames_total = {}
+        welding_codes_total = set()
+        for codes in folder_codes_by_file.values():
+            ndt_codes_with_filenames_total.update(ndt_codes_with_filenames(codes['ndt_codes']))
+            welding_codes_total.update(codes['welding_codes'])
+        yield target_folder, (ndt_codes_with_filenames_total, welding_codes_total), folder_codes_by_file, []
+
+    extracted = {}
+    codes_by_file = {}
+    failed_files = {}
+    remaining = {}
+    folder_by_file = {}
+    for target_folder, pdf_files in pdf_files_by_folder.items():
+        extracted[target_folder] = ({}, set())
+        codes_by_file[target_folder] = {}
+        failed_files[target_folder] = []
+        remaining[target_folder] = len(pdf_files)
+        for file_path in pdf_files:
+            folder_by_file[file_path] = target_folder
+        if not pdf_files:
+            yield target_folder, extracted[target_folder], codes_by_file[target_folder], failed_files[target_folder]
+
+    for file_path, codes in extraction_pool.extract(list(folder_by_file), cache):
+        target_folder = folder_by_file[file_path]
+        if codes is None:
+            failed_files[target_folder].append(file_path)
+        else:
+            ndt_codes_with_filenames_total, welding_codes_total = extracted[target_folder]
+            ndt_codes_with_filenames_total.update(ndt_codes_with_filenames(codes['ndt_codes']))
+            welding_codes_total.update(codes['welding_codes'])
+            codes_by_file[target_folder][file_path] = codes
+        remaining[target_folder] -= 1
+        if remaining[target_folder] == 0:
+            yield target_folder, extracted[target_folder], codes_by_file[target_folder], failed_files[target_folder]
+
+def collect_heat_numbers(material_files_by_folder, cache, extraction_pool):
+    """
+    以擷取工作程序池從物料追溯清單 PDF 擷取爐號。
+    Returns:
+        tuple: (目標資料夾 -> 爐號集合, 目標資料夾 -> 無法讀取的物料追溯清單 PDF 列表)。
+    """
+    heat_numbers_by_folder = {target_folder: set() for target_folder in material_files_by_folder}
+    failed_files_by_folder = defaultdict(list)
+    folder_by_file = {file_path: target_folder
+                      for target_folder, material_files in material_files_by_folder.items() for file_path in material_files}
+    for file_path, codes in extraction_pool.extract(list(folder_by_file), cache, 'material'):
+        if codes is None:
+            failed_files_by_folder[folder_by_file[file_path]].append(file_path)
+        else:
+            heat_numbers_by_folder[folder_by_file[file_path]].update(codes['heat_numbers'])
+    return heat_numbers_by_folder, failed_files_by_folder
+
+def process_folders(pdf_folder, ndt_source_pdf_folder, welding_source_pdf_folder, cache, extraction_pool=None,
+                    reference_index=None, ndt_index=None, welding_index=None, resume=False, journal=None,
+                    mismatch_policy=FOLDER_MISMATCH_POLICY, mill_cert_source_folder=MILL_CERT_SOURCE_FOLDER):
+    """
+    處理所有目標資料夾。extraction_pool 為整次執行共用的擷取工作程序池，未提供時自行建立；
+    reference_index 為編號反向索引，未提供時開啟預設索引檔並記錄本次結果；
+    ndt_index 與 welding_index 為已預先載入的來源索引（例如背景預熱的結果），未提供時在此載入。
+    每個目標資料夾完成的階段記錄在 journal（執行進度紀錄）中；resume 為 True 時接續上次中斷的執行，
+    否則清除 pdf_folder 之下的紀錄重新開始。
+    mismatch_policy 預設為 FOLDER_MISMATCH_POLICY（prompt，詢問使用者）；指定其他方式時完全不顯示對話框，無人值守時不會停下等待。
+    提供 mill_cert_source_folder 時，另外從物料追溯清單擷取爐號並收集鋼廠材證。
+    各資料夾的明細逐筆寫入執行報告；未找到的檔案與編號、原因及刪除的檔案以 ReportSamples 返回，只含筆數與前幾個範例。
+    """
     total_ndt_copied = 0
     total_welding_copied = 0
-    not_found_ndt_filenames_total = set()
-    not_found_welding_codes_total = set()
-    reasons_total = []
-    deleted_files_total = []
+    not_found_ndt_filenames_total = ReportSamples()
+    not_found_welding_codes_total = ReportSamples()
+    reasons_total = ReportSamples()
+    deleted_files_total = ReportSamples()
 
     is_as_built = "FOXWELL" in pdf_folder
     mode = "竣工模式" if is_as_built else "一般模式"
     logging.info(f"開始處理資料夾: {pdf_folder}，模式: {mode}")
 
     renamed_files = check_and_rename_files_in_folder(pdf_folder, cache)
-    if renamed_files:
+    if renamed_files and mismatch_policy == 'prompt':
         message = "以下檔案已被重新命名：\n"
         message += "\n".join(f"舊名稱：{os.path.basename(old)} -> 新名稱：{os.path.basename(new)}" for old, new in renamed_files)
         messagebox.showinfo("檔案重命名", message)
 
-    if is_target_folder(os.path.basename(pdf_folder)):
-        ndt_copied, welding_copied, not_found_ndt_filenames, not_found_welding_codes, reasons, deleted_files = process_single_folder(
-            pdf_folder, ndt_source_pdf_folder, welding_source_pdf_folder, is_as_built, cache
-        )
-        total_ndt_copied += ndt_copied
-        total_welding_copied += welding_copied
-        not_found_ndt_filenames_total.update(not_found_ndt_filenames)
-        not_found_welding_codes_total.update(not_found_welding_codes)
-        reasons_total.extend(reasons)
-        deleted_files_total.extend(deleted_files)
-    else:
-        for root, dirs, _ in os.walk(pdf_folder):
-            for dir in dirs:
-                if is_target_folder(dir):
-                    subfolder_path = os.path.join(root, dir)
-                    ndt_copied, welding_copied, not_found_ndt_filenames, not_found_welding_codes, reasons, deleted_files = process_single_folder(
-                        subfolder_path, ndt_source_pdf_folder, welding_source_pdf_folder, is_as_built, cache
-                    )
-                    total_ndt_copied += ndt_copied
-                    total_welding_copied += welding_copied
-                    not_found_ndt_filenames_total.update(not_found_ndt_filenames)
-                    not_found_welding_codes_total.update(not_found_welding_codes)
-                    reasons_total.extend(reasons)
-                    deleted_files_total.extend(deleted_files)
-            break  # 僅處理第一層子資料夾
+    # 報驗單與焊材材證來源只建立一次索引，各目標資料夾直接查表；材證解析器會記住已解析的編號
+    if ndt_index is None:
+        ndt_index = load_ndt_report_index(ndt_source_pdf_folder)
+    if welding_index is None:
+        welding_index = load_welding_cert_index(welding_source_pdf_folder)
+    welding_resolver = WeldingCertResolver(welding_index)
+    if mill_cert_source_folder and not any(layout.get('enabled') for layout in MATERIAL_TABLE_LAYOUTS.values()):
+        # 全頁比對會將日期、訂單號碼等數字誤認為爐號，沒有啟用的爐號欄位版面時不收集鋼廠材證
+        logging.warning("物料追溯表的爐號欄位版面都未啟用，本次不收集鋼廠材證")
+        mill_cert_source_folder = None
+    mill_cert_resolver = MillCertResolver(load_mill_cert_index(mill_cert_source_folder)) if mill_cert_source_folder else None
+    # 同一份來源檔案在本次執行中只讀取一次，雜湊與複製到各目標資料夾都使用同一份緩衝區
+    file_buffers = RunFileBuffers()
+    cert_store = CertificateStore(CERT_STORE_FOLDER, cache, file_buffers) if CERT_STORE_FOLDER else None
+    source_mirror = create_source_mirror()
+    if reference_index is None:
+        reference_index = CodeReferenceIndex()
+
+    # 資料夾名稱不符時可能需要詢問使用者，因此在主執行緒先找出所有銲道追溯 PDF
+    target_folders = find_target_folders(pdf_folder)
+    pdf_files_by_folder = {target_folder: find_summary_pdf_files(target_folder, is_as_built, mismatch_policy)
+                           for target_folder in target_folders}
+    pdf_files_by_folder = {target_folder: pdf_files for target_folder, pdf_files in pdf_files_by_folder.items()
+                           if pdf_files is not None}
+    target_folders = [target_folder for target_folder in target_folders if target_folder in pdf_files_by_folder]
+
+    # 接續執行時略過輸入未變更且已同步完成的資料夾，已擷取但未同步的資料夾沿用紀錄中的編號
+    if journal is None:
+        journal = RunJournal()
+    if not resume:
+        journal.reset(pdf_folder)
+    material_files_by_folder = {}
+    if mill_cert_resolver is not None:
+        material_files_by_folder = {target_folder: find_material_pdf_files(target_folder, is_as_built)
+                                    for target_folder in target_folders}
+    fingerprints = {target_folder: folder_input_fingerprint(pdf_files + material_files_by_folder.get(target_folder, []))
+                    for target_folder, pdf_files in pdf_files_by_folder.items()}
+    skipped_folders = set()
+    journaled_codes = {}
+    if resume:
+        for target_folder in target_folders:
+            entry = journal.get(target_folder, fingerprints[target_folder])
+            if entry is None:
+                continue
+            stage, codes_by_file, missing = entry
+            if stage == 'synced' and not missing:
+                skipped_folders.add(target_folder)
+                report_action('folder_skipped', folder=target_folder)
+            else:
+                journaled_codes[target_folder] = codes_by_file
+        logging.info(f"接續上次執行：略過 {len(skipped_folders)} 個已完成的資料夾，"
+                     f"{len(journaled_codes)} 個資料夾沿用已擷取的編號")
+    pending_pdf_files = {target_folder: pdf_files for target_folder, pdf_files in pdf_files_by_folder.items()
+                         if target_folder not in skipped_folders and target_folder not in journaled_codes}
+
+    # 擷取（CPU）由工作程序池處理；某個資料夾的 PDF 全部擷取完成時，即在主執行緒解析其材證編號並交由執行緒池同步（網路 I/O），
+    # 擷取與同步重疊進行
+    failed_folders = set()
+    extracted_by_folder = {}
+    # 緩衝區在同步執行緒池結束後才關閉（with 區塊依相反順序結束）
+    with file_buffers, \
+            nullcontext(extraction_pool) if extraction_pool else PdfExtractionPool(text_index=PdfTextIndex()) as pool, \
+            ThreadPoolExecutor(max_workers=FOLDER_PIPELINE_WORKERS) as io_executor:
+        futures = {}
+        # 物料追溯清單的爐號使用相同的擷取工作程序池與快取，在同步開始前擷取完成
+        heat_numbers_by_folder = {}
+        failed_material_files = {}
+        if mill_cert_resolver is not None:
+            heat_numbers_by_folder, failed_material_files = collect_heat_numbers(
+                {target_folder: material_files for target_folder, material_files in material_files_by_folder.items()
+                 if target_folder not in skipped_folders}, cache, pool
+            )
+        for target_folder, extracted_codes, codes_by_file, failed_files in iter_extracted_folders(
+                pending_pdf_files, cache, pool, journaled_codes):
+            failed_files = failed_files + failed_material_files.get(target_folder, [])
+            if failed_files:
+                # 輸入不完整時不記錄、不同步：以部分編號同步會刪除既有檔案，記錄為完成則接續執行時會被略過
+                reason = f"無法讀取 {len(failed_files)} 份 PDF，未同步目標資料夾 {target_folder}"
+                logging.error(reason)
+                report_action('folder_failed', folder=target_folder, detail=reason)
+                failed_folders.add(target_folder)
+                reasons_total.add(reason)
+                continue
+            reference_index.record_references(target_folder, codes_by_file)
+            journal.mark_extracted(target_folder, fingerprints[target_folder], codes_by_file)
+            extracted_by_folder[target_folder] = extracted_codes
+
+            # 材證編號在主執行緒解析（解析器會記住結果，只有新出現的編號才掃描材證檔名索引），
+            # 同步執行緒只查詢已解析的結果，不會在持有解析器鎖時掃描索引
+            welding_resolver.resolve(extracted_codes[1])
+            if mill_cert_resolver is not None:
+                mill_cert_resolver.resolve(heat_numbers_by_folder.get(target_folder, set()))
+            future = io_executor.submit(
+                process_single_folder, target_folder, ndt_source_pdf_folder, welding_source_pdf_folder, is_as_built, cache,
+                ndt_index, welding_resolver, extracted_codes, show_errors=False, cert_store=cert_store,
+                source_mirror=source_mirror, file_buffers=file_buffers,
+                heat_numbers=heat_numbers_by_folder.get(target_folder), mill_cert_resolver=mill_cert_resolver
+            )
+            futures[future] = target_folder
+        if pool.text_index is not None:
+            pool.text_index.remove_missing(pdf_folder)
+        for future in as_completed(futures):
+            target_folder = futures[future]
+            ndt_codes, welding_codes = extracted_by_folder.pop(target_folder)
+            try:
+                result = future.result()
+            except Exception as e:
+                logging.error(f"處理資料夾時發生錯誤 {target_folder}: {e}")
+                report_action('folder_failed', folder=target_folder, detail=str(e))
+                failed_folders.add(target_folder)
+                result = (0, 0, set(), set(), [f"處理資料夾 {target_folder} 時發生錯誤：{e}"], [])
+            # 各資料夾的明細逐筆寫入執行報告，此處只累加筆數與前幾個範例
+            report_folder_result(target_folder, result)
+            ndt_copied, welding_copied, not_found_ndt_filenames, not_found_welding_codes, reasons, deleted_files = result
+            total_ndt_copied += ndt_copied
+            total_welding_copied += welding_copied
+            not_found_ndt_filenames_total.update(not_found_ndt_filenames)
+            not_found_welding_codes_total.update(not_found_welding_codes)
+            reasons_total.update(reasons)
+            deleted_files_total.update(deleted_files)
+            if target_folder in failed_folders:
+                continue
+
+            # 更新反向索引中各編號的狀態後，才將資料夾記錄為已同步
+            reference_index.record_status(
+                target_folder, 'ndt', ndt_codes,
+                {code for code, file_name in ndt_codes.items() if file_name in not_found_ndt_filenames}
+            )
+            reference_index.record_status(target_folder, 'welding', welding_codes, not_found_welding_codes)
+            journal.mark_synced(target_folder, fingerprints[target_folder],
+                                len(not_found_ndt_filenames) + len(not_found_welding_codes))
 
     logging.info(f"完成處理資料夾: {pdf_folder}")
     return total_ndt_copied, total_welding_copied, not_found_ndt_filenames_total, not_found_welding_codes_total, reasons_total, deleted_files_total
 
 # 主函數
-def main():
-    """主函式。"""
+# 選擇資料夾期間的背景預熱
+def load_settings():
+    """載入上次執行記錄的設定，檔案不存在或無法讀取時返回空字典。"""
+    if os.path.exists(SETTINGS_FILE):
+        try:
+            with open(SETTINGS_FILE, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            logging.error(f"無法載入設定檔 {SETTINGS_FILE}: {e}")
+    return {}
+
+def save_settings(settings):
+    """儲存設定檔。"""
+    try:
+        with open(SETTINGS_FILE, 'w', encoding='utf-8') as f:
+            json.dump(settings, f, ensure_ascii=False, indent=2)
+    except Exception as e:
+        logging.error(f"無法儲存設定檔 {SETTINGS_FILE}: {e}")
+
+def prestat_summary_folders(pdf_folder):
+    """預先列出各目標資料夾及其子資料夾，讓檔案系統快取在正式處理前就緒。"""
+    for target_folder in find_target_folders(pdf_folder):
+        with os.scandir(target_folder) as entries:
+            subdirs = [entry.path for entry in entries if entry.is_dir(follow_symlinks=False)]
+        for subdir in subdirs:
+            with os.scandir(subdir) as entries:
+                for entry in entries:
+                    entry.stat()
+
+class SpeculativeWarmup:
+    """
+    在使用者選擇資料夾期間，依預期的資料夾於背景建立報驗單與焊材材證索引並預先列出銲道追溯資料夾。
+    使用者確認的資料夾與預期相同時沿用背景結果，不同時捨棄（背景執行緒繼續執行完畢，
+    寫回索引檔時與本次處理共用同一把鎖，不會覆蓋本次處理寫入的索引）。
+    """
+    def __init__(self, pdf_folder, ndt_source_pdf_folder, welding_source_pdf_folder):
+        self.results = {}
+        self.threads = {}
+        for key, folder, loader in (
+            ('pdf_folder', pdf_folder, prestat_summary_folders),
+            ('ndt_source_pdf_folder', ndt_source_pdf_folder, load_ndt_report_index),
+            ('welding_source_pdf_folder', welding_source_pdf_folder, load_welding_cert_index),
+        ):
+            if folder and os.path.isdir(folder):
+                thread = threading.Thread(target=self._run, args=(key, folder, loader), daemon=True)
+                self.threads[key] = (os.path.normpath(folder), thread)
+                thread.start()
+
+    def _run(self, key, folder, loader):
+        try:
+            self.results[key] = loader(folder)
+            logging.info(f"背景預熱完成: {folder}")
+        except Exception as e:
+            logging.warning(f"背景預熱失敗 {folder}: {e}")
+
+    def take(self, key, folder):
+        """
+        取得背景預熱結果。選擇的資料夾與預熱的資料夾相同時等待預熱完成並返回結果，否則返回 None。
+        """
+        if key not in self.threads:
+            return None
+        expected_folder, thread = self.threads[key]
+        if os.path.normpath(folder) != expected_folder:
+            logging.info(f"選擇的資料夾與預熱的資料夾不同，捨棄背景預熱結果: {expected_folder}")
+            return None
+        thread.join()
+        return self.results.get(key)
+
+def main(resume=False, mismatch_policy=FOLDER_MISMATCH_POLICY):
+    """
+    主函式。resume 為 True 時接續上次中斷的執行，略過已完成且未變更的目標資料夾；
+    mismatch_policy 為銲道追溯資料夾名稱不符時的處理方式。
+    """
     root = tk.Tk()
     root.withdraw()
 
     cache = FileCache()
 
-    pdf_initialdir = "C:/Users/CWP-PC-E-COM302/Box/T460 風電 品管 簡瑞成/FAT package"
+    # 使用上次選擇的資料夾（或預設路徑）在背景預熱，選擇資料夾的時間與走訪來源資料夾的時間重疊
+    settings = load_settings()
+    pdf_initialdir = settings.get('pdf_folder', "C:/Users/CWP-PC-E-COM302/Box/T460 風電 品管 簡瑞成/FAT package")
+    ndt_source_pdf_initialdir = settings.get(
+        'ndt_source_pdf_folder', "U:/N-品管部/@品管部共用資料區/專案/CWP06 台電二期專案/報驗單/001_JK報驗單/完成 (pdf)"
+    )
+    welding_source_pdf_initialdir = settings.get(
+        'welding_source_pdf_folder', "U:/N-品管部/@品管部共用資料區/品管人員資料夾/T460 風電 品管 簡瑞成/焊材材證"
+    )
+    warmup = SpeculativeWarmup(pdf_initialdir, ndt_source_pdf_initialdir, welding_source_pdf_initialdir)
+
     pdf_folder = filedialog.askdirectory(
         initialdir=pdf_initialdir,
         title="請選擇包含銲道追溯檔案的資料夾:"
@@ -567,7 +2610,6 @@ def main():
         messagebox.showwarning("警告", "未選擇任何資料夾，程序將終止。")
         return
 
-    ndt_source_pdf_initialdir = "U:/N-品管部/@品管部共用資料區/專案/CWP06 台電二期專案/報驗單/001_JK報驗單/完成 (pdf)"
     ndt_source_pdf_folder = filedialog.askdirectory(
         initialdir=ndt_source_pdf_initialdir,
         title="請選擇包含報驗單 PDF 檔案的資料夾:"
@@ -577,7 +2619,6 @@ def main():
         messagebox.showwarning("警告", "未選擇任何報驗單資料夾，程序將終止。")
         return
 
-    welding_source_pdf_initialdir = "U:/N-品管部/@品管部共用資料區/品管人員資料夾/T460 風電 品管 簡瑞成/焊材材證"
     welding_source_pdf_folder = filedialog.askdirectory(
         initialdir=welding_source_pdf_initialdir,
         title="請選擇包含焊材材證 PDF 檔案的資料夾:"
@@ -587,48 +2628,390 @@ def main():
         messagebox.showwarning("警告", "未選擇任何焊材材證資料夾，程序將終止。")
         return
 
+    save_settings({
+        'pdf_folder': pdf_folder,
+        'ndt_source_pdf_folder': ndt_source_pdf_folder,
+        'welding_source_pdf_folder': welding_source_pdf_folder,
+    })
+    warmup.take('pdf_folder', pdf_folder)
+    ndt_index = warmup.take('ndt_source_pdf_folder', ndt_source_pdf_folder)
+    welding_index = warmup.take('welding_source_pdf_folder', welding_source_pdf_folder)
+
     is_as_built = "FOXWELL" in pdf_folder
     mode = "竣工模式" if is_as_built else "一般模式"
 
-    total_ndt_copied, total_welding_copied, not_found_ndt_filenames_total, not_found_welding_codes_total, reasons_total, deleted_files_total = process_folders(
-        pdf_folder, ndt_source_pdf_folder, welding_source_pdf_folder, cache
-    )
+    # 每個動作即時寫入執行報告，完成時只顯示摘要，避免將大量路徑組成單一訊息
+    with RunReport() as report:
+        total_ndt_copied, total_welding_copied, not_found_ndt_filenames_total, not_found_welding_codes_total, reasons_total, deleted_files_total = process_folders(
+            pdf_folder, ndt_source_pdf_folder, welding_source_pdf_folder, cache,
+            ndt_index=ndt_index, welding_index=welding_index, resume=resume, mismatch_policy=mismatch_policy
+        )
+
+        # 檢查每個目標資料夾下的 Welding Identification 與 Material Traceability 資料夾是否存在 PDF 檔案
+        missing_welding_identification, missing_material_traceability = check_required_pdf_files(pdf_folder, is_as_built)
+        for folder_path in missing_welding_identification:
+            report_action('missing_summary_pdf', folder=folder_path)
+        for folder_path in missing_material_traceability:
+            report_action('missing_material_pdf', folder=folder_path)
 
-    # 檢查每個目標資料夾下的 Welding Identification 與 Material Traceability 資料夾是否存在 PDF 檔案
-    missing_welding_identification, missing_material_traceability = check_required_pdf_files(pdf_folder, is_as_built)
     warning_message = ""
     if missing_welding_identification:
-        warning_message += "缺少銲道追溯清單 PDF:\n" + "\n".join(missing_welding_identification) + "\n\n"
+        warning_message += f"缺少銲道追溯清單 PDF: {len(missing_welding_identification)} 個資料夾\n"
     if missing_material_traceability:
-        warning_message += "缺少物料追溯清單 PDF:\n" + "\n".join(missing_material_traceability)
+        warning_message += f"缺少物料追溯清單 PDF: {len(missing_material_traceability)} 個資料夾\n"
     if warning_message:
-        messagebox.showwarning("警告", warning_message)
+        messagebox.showwarning("警告", warning_message + f"\n詳細清單請見執行報告：{report.report_path}")
 
     message = f"執行模式: {mode}\n\n"
-    message += f"報驗單: 共複製了 {total_ndt_copied} 份。\n"
-    message += f"焊材材證: 共複製了 {total_welding_copied} 份。\n\n"
+    message += f"報驗單: 共同步了 {total_ndt_copied} 份。\n"
+    message += f"焊材材證: 共同步了 {total_welding_copied} 份。\n\n"
 
     if not_found_ndt_filenames_total:
-        missing_ndt_filenames_str = ", ".join(not_found_ndt_filenames_total)
-        message += f"以下報驗單編號的檔案在報驗單資料夾中未找到，有可能尚未上傳：{missing_ndt_filenames_str}\n\n"
+        message += f"報驗單資料夾中未找到的檔案（有可能尚未上傳）：{format_samples(not_found_ndt_filenames_total)}\n\n"
 
     if not_found_welding_codes_total:
-        missing_welding_codes_str = ", ".join(not_found_welding_codes_total)
-        message += f"以下焊材材證編號的檔案在焊材材證資料夾中未找到，有可能輸入有誤：{missing_welding_codes_str}"
+        message += f"焊材材證資料夾中未找到的編號（有可能輸入有誤）：{format_samples(not_found_welding_codes_total)}\n\n"
 
     if total_ndt_copied == 0 and total_welding_copied == 0 and reasons_total:
-        message += "\n\n沒有檔案被複製，具體原因如下：\n"
-        message += "\n".join(reasons_total)
+        message += f"沒有檔案被同步，共 {len(reasons_total)} 項原因。\n\n"
 
     if deleted_files_total:
-        message += "\n\n以下檔案因為檔名不符合已被刪除：\n"
-        for file_path in deleted_files_total:
-            message += f"{file_path}\n"
+        message += f"因為檔名不符合而刪除的檔案：{len(deleted_files_total)} 份。\n\n"
 
+    message += f"詳細紀錄：{report.report_path}"
     messagebox.showinfo("完成", message)
 
     cache.save_cache()
     logging.info("程式執行完成。")
 
+# 無人值守批次模式
+def load_batch_jobs(job_file):
+    """
+    載入批次工作檔（JSON）。格式：
+        {"mismatch_policy": "use_existing", "resume": false,
+         "ndt_source": "...", "welding_source": "...",
+         "jobs": [{"pdf_folder": "...", "ndt_source": "...", "welding_source": "..."}, ...]}
+    每個工作未指定的 ndt_source / welding_source / mill_cert_source / mismatch_policy / resume 使用最上層的設定。
+    Returns:
+        list: 每個工作的設定字典。
+    """
+    with open(job_file, 'r', encoding='utf-8') as f:
+        batch = json.load(f)
+    jobs = []
+    for job in batch.get('jobs', []):
+        job = dict(job)
+        for key, default in (('ndt_source', None), ('welding_source', None), ('mill_cert_source', MILL_CERT_SOURCE_FOLDER),
+                             ('mismatch_policy', 'skip'), ('resume', False)):
+            job.setdefault(key, batch.get(key, default))
+        if not job.get('pdf_folder') or not job['ndt_source'] or not job['welding_source']:
+            raise ValueError(f"批次工作缺少 pdf_folder、ndt_source 或 welding_source: {job}")
+        if job['mismatch_policy'] not in MISMATCH_POLICIES or job['mismatch_policy'] == 'prompt':
+            raise ValueError(f"批次模式不支援的資料夾名稱不符處理方式: {job['mismatch_policy']}")
+        jobs.append(job)
+    return jobs
+
+def run_batch(job_file, cache):
+    """
+    依批次工作檔在同一個程序中處理多個 FAT package，不顯示任何對話框。
+    來源索引（依來源資料夾）、檔案快取、擷取工作程序池、反向索引與執行報告由所有工作共用。
+    Returns:
+        int: 失敗的工作數。
+    """
+    jobs = load_batch_jobs(job_file)
+    ndt_indexes = {}
+    welding_indexes = {}
+    failed_jobs = 0
+    logging.info(f"開始批次處理，共 {len(jobs)} 個工作")
+    with RunReport() as report, PdfExtractionPool(text_index=PdfTextIndex()) as pool:
+        reference_index = CodeReferenceIndex()
+        for job in jobs:
+            pdf_folder = job['pdf_folder']
+            try:
+                ndt_source = os.path.normpath(job['ndt_source'])
+                welding_source = os.path.normpath(job['welding_source'])
+                if ndt_source not in ndt_indexes:
+                    ndt_indexes[ndt_source] = load_ndt_report_index(ndt_source)
+                if welding_source not in welding_indexes:
+                    welding_indexes[welding_source] = load_welding_cert_index(welding_source)
+                result = process_folders(
+                    pdf_folder, ndt_source, welding_source, cache, extraction_pool=pool, reference_index=reference_index,
+                    ndt_index=ndt_indexes[ndt_source], welding_index=welding_indexes[welding_source],
+                    resume=job['resume'], mismatch_policy=job['mismatch_policy'],
+                    mill_cert_source_folder=job['mill_cert_source']
+                )
+                missing_welding_identification, missing_material_traceability = check_required_pdf_files(
+                    pdf_folder, "FOXWELL" in pdf_folder
+                )
+                for folder_path in missing_welding_identification:
+                    report_action('missing_summary_pdf', folder=folder_path)
+                for folder_path in missing_material_traceability:
+                    report_action('missing_material_pdf', folder=folder_path)
+                report_action('job_done', folder=pdf_folder, detail={
+                    'ndt_copied': result[0], 'welding_copied': result[1],
+                    'missing_ndt': len(result[2]), 'missing_welding': len(result[3]),
+                })
+                print(f"{pdf_folder}: 報驗單 {result[0]} 份，焊材材證 {result[1]} 份，"
+                      f"未找到報驗單 {len(result[2])} 份、焊材材證編號 {len(result[3])} 個")
+            except Exception as e:
+                failed_jobs += 1
+                logging.error(f"批次工作失敗 {pdf_folder}: {e}")
+                report_action('job_failed', folder=pdf_folder, detail=str(e))
+                print(f"{pdf_folder}: 失敗 - {e}")
+    cache.save_cache()
+    print(f"批次處理完成：{len(jobs) - failed_jobs}/{len(jobs)} 個工作成功，執行報告：{report.report_path}")
+    return failed_jobs
+
+# 來源資料夾監看（常駐模式）
+class InotifySourceWatcher:
+    """以 Linux inotify 監看來源資料夾（含子資料夾），返回有變動的資料夾。"""
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_Q_OVERFLOW = 0x00004000
+    IN_ISDIR = 0x40000000
+    WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+    EVENT_HEADER = struct.Struct('iIII')
+
+    def __init__(self, root_folders):
+        self.root_folders = root_folders
+        self.libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self.fd = self.libc.inotify_init1(os.O_CLOEXEC)
+        if self.fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+        self.wd_paths = {}
+        for root_folder in root_folders:
+            self._add_tree(root_folder)
+        logging.info(f"inotify 監看中，共 {len(self.wd_paths)} 個資料夾")
+
+    def _add_tree(self, root_folder):
+        for dir_path, _, _ in os.walk(root_folder):
+            wd = self.libc.inotify_add_watch(self.fd, os.fsencode(dir_path), self.WATCH_MASK)
+            if wd < 0:
+                logging.warning(f"無法監看資料夾 {dir_path}: {os.strerror(ctypes.get_errno())}")
+            else:
+                self.wd_paths[wd] = dir_path
+
+    def _read_changed_dirs(self, timeout):
+        """讀取一批事件；返回有變動的資料夾集合，事件佇列溢位時返回 None（需全面檢查）。"""
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return set()
+        data = os.read(self.fd, 64 * 1024)
+        changed_dirs = set()
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = self.EVENT_HEADER.unpack_from(data, offset)
+            name = os.fsdecode(data[offset + self.EVENT_HEADER.size:offset + self.EVENT_HEADER.size + length].rstrip(b'\0'))
+            offset += self.EVENT_HEADER.size + length
+            if mask & self.IN_Q_OVERFLOW:
+                return None
+            dir_path = self.wd_paths.get(wd)
+            if dir_path is None:
+                continue
+            changed_dirs.add(dir_path)
+            if mask & self.IN_ISDIR and mask & (self.IN_CREATE | self.IN_MOVED_TO):
+                new_dir = os.path.join(dir_path, name)
+                self._add_tree(new_dir)
+                changed_dirs.add(new_dir)
+        return changed_dirs
+
+    def wait_for_changes(self):
+        """
+        等待來源資料夾變動，收到第一個事件後再等待 WATCH_SETTLE_SECONDS 收集同一批事件。
+        Returns:
+            set or None: 有變動的資料夾；None 表示需檢查整個來源資料夾。
+        """
+        changed_dirs = set()
+        while not changed_dirs:
+            changed_dirs = self._read_changed_dirs(None)
+            if changed_dirs is None:
+                return None
+        deadline = time.monotonic() + WATCH_SETTLE_SECONDS
+        while (remaining := deadline - time.monotonic()) > 0:
+            more_dirs = self._read_changed_dirs(remaining)
+            if more_dirs is None:
+                return None
+            changed_dirs |= more_dirs
+        return changed_dirs
+
+    def close(self):
+        os.close(self.fd)
+
+class PollingSourceWatcher:
+    """以固定間隔輪詢的監看方式，適用於無法使用 inotify 的系統或網路磁碟。"""
+    def __init__(self, root_folders, interval=WATCH_POLL_SECONDS):
+        self.root_folders = root_folders
+        self.interval = interval
+        logging.info(f"以輪詢方式監看來源資料夾，間隔 {interval} 秒")
+
+    def wait_for_changes(self):
+        """等待一個輪詢間隔；返回 None 表示由來源索引依資料夾 mtime 檢查整個來源資料夾。"""
+        time.sleep(self.interval)
+        return None
+
+    def close(self):
+        pass
+
+def create_source_watcher(root_folders, use_inotify=None):
+    """
+    建立來源資料夾監看器。use_inotify 為 None 時，Linux 上使用 inotify，其他系統或失敗時改用輪詢。
+    注意：掛載的網路磁碟（SMB）上由其他電腦新增的檔案不會觸發 inotify，此時應使用輪詢。
+    """
+    if use_inotify is None:
+        use_inotify = sys.platform.startswith('linux')
+    if use_inotify:
+        try:
+            return InotifySourceWatcher(root_folders)
+        except Exception as e:
+            logging.warning(f"無法使用 inotify，改用輪詢: {e}")
+    return PollingSourceWatcher(root_folders)
+
+def refresh_index_and_find_new_files(source_index, changed_dirs):
+    """更新來源索引並返回新增或變更的檔案路徑。"""
+    before = set(source_index.iter_files())
+    if changed_dirs is None:
+        source_index.refresh()
+    else:
+        in_root = [dir_path for dir_path in changed_dirs if source_index.relative_path(dir_path) is not None]
+        if not in_root:
+            return set()
+        source_index.refresh(in_root)
+    source_index.save_index()
+    return {file_path for file_path, size, mtime in set(source_index.iter_files()) - before}
+
+def update_target_folder(target_folder, ndt_source_pdf_folder, welding_source_pdf_folder, is_as_built, cache,
+                         ndt_index, welding_resolver, reference_index, cert_store=None, source_mirror=None,
+                         file_buffers=None):
+    """依反向索引中記錄的編號重新同步單一目標資料夾，不重新開啟銲道追溯 PDF。"""
+    ndt_codes, welding_codes = reference_index.codes_for_folder(target_folder)
+    ndt_copied, welding_copied, not_found_ndt_filenames, not_found_welding_codes, reasons, deleted_files = process_single_folder(
+        target_folder, ndt_source_pdf_folder, welding_source_pdf_folder, is_as_built, cache,
+        ndt_index, welding_resolver, (ndt_codes, welding_codes), show_errors=False, cert_store=cert_store,
+        source_mirror=source_mirror, file_buffers=file_buffers
+    )
+    reference_index.record_status(
+        target_folder, 'ndt', ndt_codes, {code for code, file_name in ndt_codes.items() if file_name in not_found_ndt_filenames}
+    )
+    reference_index.record_status(target_folder, 'welding', welding_codes, not_found_welding_codes)
+    logging.info(f"已更新目標資料夾 {target_folder}: 報驗單 {ndt_copied} 份，焊材材證 {welding_copied} 份，"
+                 f"仍缺 {len(not_found_ndt_filenames)} 份報驗單、{len(not_found_welding_codes)} 個焊材材證編號")
+
+def watch_sources(pdf_folder, ndt_source_pdf_folder, welding_source_pdf_folder, cache, use_inotify=None):
+    """
+    常駐監看報驗單與焊材材證來源資料夾。新增或重新命名的檔案出現時，
+    依反向索引找出引用該編號的目標資料夾（限 pdf_folder 之下），只更新這些資料夾。
+    需先以一般流程處理過 pdf_folder，反向索引中才有引用紀錄。
+    """
+    is_as_built = "FOXWELL" in pdf_folder
+    pdf_folder = os.path.normpath(pdf_folder)
+    ndt_index = load_ndt_report_index(ndt_source_pdf_folder)
+    welding_index = load_welding_cert_index(welding_source_pdf_folder)
+    reference_index = CodeReferenceIndex()
+    source_mirror = create_source_mirror()
+    watcher = create_source_watcher([ndt_source_pdf_folder, welding_source_pdf_folder], use_inotify)
+    logging.info(f"開始監看來源資料夾，目標資料夾: {pdf_folder}")
+
+    try:
+        while True:
+            changed_dirs = watcher.wait_for_changes()
+            new_ndt_files = refresh_index_and_find_new_files(ndt_index, changed_dirs)
+            new_welding_files = refresh_index_and_find_new_files(welding_index, changed_dirs)
+            if not new_ndt_files and not new_welding_files:
+                continue
+
+            affected_folders = set()
+            for file_path in new_ndt_files:
+                ndt_code = RE_NDT_SOURCE_FILENAME.search(os.path.basename(file_path)).group(1)
+                affected_folders.update(row[2] for row in reference_index.folders_referencing(f"NDT-{ndt_code}"))
+            if new_welding_files:
+                matcher = AhoCorasickMatcher(reference_index.referenced_codes('welding', pdf_folder))
+                for file_path in new_welding_files:
+                    for code in matcher.find_all(os.path.basename(file_path)):
+                        affected_folders.update(row[2] for row in reference_index.folders_referencing(code)
+                                                if row[0] == 'welding')
+            # 索引中的目標資料夾與 pdf_folder 都以 normpath 形式比對
+            affected_folders = sorted(folder for folder in map(os.path.normpath, affected_folders)
+                                      if folder == pdf_folder or folder.startswith(os.path.join(pdf_folder, '')))
+            logging.info(f"偵測到 {len(new_ndt_files)} 份新報驗單、{len(new_welding_files)} 份新焊材材證，"
+                         f"需更新 {len(affected_folders)} 個目標資料夾")
+
+            # 材證解析器會記住未找到的編號，每批變動使用新的解析器
+            welding_resolver = WeldingCertResolver(welding_index)
+            with RunFileBuffers() as file_buffers:
+                cert_store = CertificateStore(CERT_STORE_FOLDER, cache, file_buffers) if CERT_STORE_FOLDER else None
+                for target_folder in affected_folders:
+                    try:
+                        update_target_folder(target_folder, ndt_source_pdf_folder, welding_source_pdf_folder, is_as_built,
+                                             cache, ndt_index, welding_resolver, reference_index, cert_store,
+                                             source_mirror, file_buffers)
+                    except Exception as e:
+                        logging.error(f"更新目標資料夾時發生錯誤 {target_folder}: {e}")
+    except KeyboardInterrupt:
+        logging.info("已停止監看來源資料夾。")
+    finally:
+        watcher.close()
+        cache.save_cache()
+
+# 反向索引查詢
+def print_reference_query(args):
+    """依命令列參數查詢編號反向索引並輸出結果。"""
+    reference_index = CodeReferenceIndex()
+    if args.who_needs:
+        rows = reference_index.folders_referencing(args.who_needs, waiting_only=not args.all_references)
+        if not rows:
+            print(f"沒有目標資料夾{'引用' if args.all_references else '在等待'}編號 {args.who_needs}")
+        for kind, code, target_folder, summary_pdf in rows:
+            print(f"[{kind}] {code}\t{target_folder}\t{os.path.basename(summary_pdf)}")
+    if args.missing:
+        missing = reference_index.missing_codes(args.kind)
+        for (kind, code), target_folders in missing.items():
+            print(f"[{kind}] {code}\t{len(target_folders)} 個資料夾: {', '.join(target_folders)}")
+        print(f"共 {len(missing)} 個編號尚未找到對應檔案")
+
+def print_text_search(args):
+    """在全文檢索索引中搜尋文字並輸出符合的檔案與頁碼。"""
+    rows = PdfTextIndex().search(args.search, args.limit)
+    for file_path, page, snippet in rows:
+        print(f"{file_path}\t第 {page} 頁\t{' '.join(snippet.split())}")
+    print(f"共 {len(rows)} 個頁面符合「{args.search}」")
+
+def parse_args(argv=None):
+    """解析命令列參數；未提供任何查詢參數時執行圖形介面流程。"""
+    parser = argparse.ArgumentParser(description="NDT 報驗單與焊材材證整理工具")
+    parser.add_argument('--who-needs', metavar='CODE', help="查詢等待某個 NDT 或焊材材證編號的目標資料夾")
+    parser.add_argument('--all-references', action='store_true', help="搭配 --who-needs，列出所有引用該編號的資料夾")
+    parser.add_argument('--missing', action='store_true', help="列出整個索引中尚未找到對應檔案的編號")
+    parser.add_argument('--kind', choices=sorted(CodeReferenceIndex.KINDS), help="搭配 --missing，只列出某類編號")
+    parser.add_argument('--watch', metavar='PDF_FOLDER', help="常駐監看來源資料夾，有新檔案時只更新此資料夾下受影響的目標資料夾")
+    parser.add_argument('--ndt-source', metavar='FOLDER', help="搭配 --watch，報驗單 PDF 來源資料夾")
+    parser.add_argument('--welding-source', metavar='FOLDER', help="搭配 --watch，焊材材證 PDF 來源資料夾")
+    parser.add_argument('--poll', action='store_true', help="搭配 --watch，不使用 inotify，改以輪詢檢查")
+    parser.add_argument('--audit', metavar='PDF_FOLDER', help="以目錄快照稽核 FAT package 完整性，輸出各目標資料夾的狀態表")
+    parser.add_argument('--batch', metavar='JOB_FILE', help="依批次工作檔（JSON）處理多個 FAT package，不顯示任何對話框")
+    parser.add_argument('--mismatch-policy', choices=MISMATCH_POLICIES, default=FOLDER_MISMATCH_POLICY,
+                        help="銲道追溯資料夾名稱不符時的處理方式")
+    parser.add_argument('--resume', action='store_true', help="接續上次中斷的執行，略過已完成且輸入未變更的目標資料夾")
+    parser.add_argument('--search', metavar='TEXT', help="在已擷取的銲道追溯 PDF 文字中搜尋，列出符合的檔案與頁碼")
+    parser.add_argument('--limit', type=int, default=50, help="搭配 --search，最多列出的頁面數")
+    args = parser.parse_args(argv)
+    if args.watch and not (args.ndt_source and args.welding_source):
+        parser.error("--watch 需要同時指定 --ndt-source 與 --welding-source")
+    return args
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    args = parse_args()
+    if args.who_needs or args.missing:
+        print_reference_query(args)
+    elif args.search:
+        print_text_search(args)
+    elif args.audit:
+        print_audit(args.audit)
+    elif args.batch:
+        sys.exit(1 if run_batch(args.batch, FileCache()) else 0)
+    elif args.watch:
+        watch_sources(args.watch, args.ndt_source, args.welding_source, FileCache(), use_inotify=False if args.poll else None)
+    else:
+        main(resume=args.resume, mismatch_policy=args.mismatch_policy)
\ No newline at end of file
@@ -0,0 +1,120 @@
+import os
+import re
+from difflib import get_close_matches
+
+# FAT package 資料夾結構的唯一定義，ndt_wm.py、syb.py、syc.py、As bulit.py 與 As_bulit_cpFAT.py 共用
+
+# 目標資料夾（單一構件）名稱：前綴 + '#' + 流水號。各腳本處理的範圍不同（會刪除檔案或加蓋簽名），
+# 依腳本分別定義並維持各自原本的規則，不因共用而擴大範圍；整段比對結果即為目標資料夾基本名稱
+TARGET_FOLDER_PATTERNS = {
+    'ndt_wm': re.compile(r'XB1#\d+|XB[1-4][ABC]#\d+|6S21[1-7]#\d+|6S20[12356]#\d+', re.IGNORECASE),
+    'syb': re.compile(r'XB1#\d+|XB[1-4][ABC]#\d+|6S21[1-7]#\d+|6S20[1256]#\d+$'),
+    'syc': re.compile(r'XB1#\d+|XB[1-4][ABC]#\d+|6S21[1-7]#\d+|6S20[12356]#\d+'),
+    'as_built': re.compile(r'(?P<prefix>XB1|XB[1-4][ABC]|6S21[1-7]|6S20[12356]|XB3B\.002|XB4B\.002)#(?P<serial>\d+)',
+                           re.IGNORECASE),
+}
+
+# 各模式的標準子資料夾名稱：用途 -> 資料夾名稱
+AS_BUILT_FOLDERS = {
+    'workshop_drawings': "01 Workshop Drawings",
+    'material': "02 Material Traceability",
+    'welding_summary': "04 Welding Identification Summary",
+    'welding_consumable': "05 Welding Consumable",
+    'ndt_reports': "06 NDT Reports",
+    'dimensional_reports': "07 Dimensional Reports",
+    'fat_reports': "09 FAT reports (Incl. punch list)",
+}
+GENERAL_FOLDERS = {
+    'material': "02 Material Traceability & Mill Cert",
+    'welding_summary': "01 Welding Identification Summary",
+    'welding_consumable': os.path.join("02 Material Traceability & Mill Cert", "Welding Consumable"),
+    'ndt_reports': "04 NDT Reports",
+}
+
+# 已知的舊名稱或別名：用途 -> 名稱列表，比對時忽略大小寫、空白與標點
+AS_BUILT_ALIASES = {
+    'workshop_drawings': ["05 Drawings", "05 Workshop Drawings"],
+    'material': ["02 Material Traceability & Mill Cert", "Material certificates"],
+    'welding_summary': ["01 Welding Summary", "01 Welding Identification Summary"],
+    'welding_consumable': ["Welding Consumable"],
+    'ndt_reports': ["04 NDT Reports"],
+    'dimensional_reports': ["03 Dimension Inspection Record"],
+    'fat_reports': ["07 FAT report", "07 FAT reports"],
+}
+GENERAL_ALIASES = {
+    'welding_summary': ["01 Welding Summary"],
+}
+
+FUZZY_MATCH_CUTOFF = 0.6  # 名稱與別名都比對不到時，相似度達此值的資料夾才視為同一用途
+
+RE_NORMALIZE = re.compile(r'[\W_]+')
+
+
+def normalize_folder_name(name):
+    """將資料夾名稱正規化為比對用的鍵：小寫並移除空白、標點與底線。"""
+    return RE_NORMALIZE.sub('', name).lower()
+
+
+def parse_target_folder(folder_name):
+    """
+    以竣工資料夾的規則從資料夾名稱中提取目標資料夾的前綴與流水號。
+    Returns:
+        tuple: (前綴（保留原本的大小寫）, 流水號)，不是目標資料夾時返回 None。
+    """
+    match = TARGET_FOLDER_PATTERNS['as_built'].search(folder_name)
+    return (match.group('prefix'), match.group('serial')) if match else None
+
+
+class FolderSchema:
+    """
+    預先編譯的資料夾結構：以一次正規化字典查詢將資料夾名稱對應到用途，
+    標準名稱與別名都比對不到時才以相似度比對作為最後手段。
+    """
+
+    def __init__(self, folders, aliases, fuzzy_cutoff=FUZZY_MATCH_CUTOFF):
+        self.folders = dict(folders)
+        self.fuzzy_cutoff = fuzzy_cutoff
+        self._roles = {}
+        for role, names in aliases.items():
+            for name in names:
+                self._roles[normalize_folder_name(name)] = role
+        for role, name in self.folders.items():
+            self._roles[normalize_folder_name(name)] = role
+
+    def folder_name(self, role):
+        """返回用途對應的標準資料夾名稱。"""
+        return self.folders[role]
+
+    def canonical_name(self, name):
+        """返回資料夾名稱對應的標準名稱（只比對標準名稱與別名），不屬於結構時返回 None。"""
+        role = self._roles.get(normalize_folder_name(name))
+        return self.folders[role] if role else None
+
+    def find(self, role, names, fuzzy=True):
+        """
+        在 names 中找出用途為 role 的資料夾。
+        Returns:
+            tuple: (資料夾名稱, 比對方式)，比對方式為 'exact'、'alias' 或 'fuzzy'；找不到時返回 (None, None)。
+        """
+        target_name = self.folders[role]
+        if target_name in names:
+            return target_name, 'exact'
+        for name in names:
+            if self._roles.get(normalize_folder_name(name)) == role:
+                return name, 'alias'
+        if fuzzy:
+            # 已對應到其他用途的資料夾不列入相似度比對
+            candidates = [name for name in names if normalize_folder_name(name) not in self._roles]
+            close_matches = get_close_matches(target_name, candidates, n=1, cutoff=self.fuzzy_cutoff)
+            if close_matches:
+                return close_matches[0], 'fuzzy'
+        return None, None
+
+
+AS_BUILT_SCHEMA = FolderSchema(AS_BUILT_FOLDERS, AS_BUILT_ALIASES)
+GENERAL_SCHEMA = FolderSchema(GENERAL_FOLDERS, GENERAL_ALIASES)
+
+
+def get_folder_schema(is_as_built):
+    """返回竣工模式或一般模式的資料夾結構。"""
+    return AS_BUILT_SCHEMA if is_as_built else GENERAL_SCHEMA
@@ -0,0 +1,78 @@
+from functools import lru_cache
+from PIL import Image, ImageChops, ImageDraw, ImageFont
+from reportlab.lib.utils import ImageReader
+
+# 簽名圖片的產生設定，syb.py 與 syc.py 共用；同一個 (日期, 樣式) 每個程序只產生一次並保留在記憶體中
+SIGNATURE_IMAGE_FILE = "紹宇.jpg"
+SIGNATURE_FONT_FILE = "JasonHandwriting2-Regular.ttf"
+BACKGROUND_THRESHOLD = 100  # RGB 都高於此值的像素（灰色或白色背景）轉為透明，可以調整這個值來改變透明化的程度
+SIGNATURE_TARGET_HEIGHT = 50  # 簽名加日期的圖片最後縮放到的高度（像素）
+# 樣式名稱 -> 日期文字的字體大小與簽名和日期之間的間距
+SIGNATURE_STYLES = {
+    'standard': {'font_size': 100, 'padding': 20},
+    'large': {'font_size': 200, 'padding': 40},  # 較大字體大小以保持清晰度
+}
+
+
+@lru_cache(maxsize=None)
+def load_keyed_signature(image_file=SIGNATURE_IMAGE_FILE, threshold=BACKGROUND_THRESHOLD):
+    """
+    開啟原始簽名圖片並將灰色背景轉換為透明。以 PIL 的色版運算一次處理整張圖片，不逐像素迴圈。
+    Returns:
+        Image: RGBA 模式的簽名圖片，背景像素為 (255, 255, 255, 0)。
+    """
+    img = Image.open(image_file).convert('RGBA')
+    # 每個色版高於閾值的像素為 255，三個色版相乘後即為 RGB 都高於閾值的背景遮罩
+    lut = [255 if value > threshold else 0 for value in range(256)]
+    red, green, blue, _ = (band.point(lut) for band in img.split())
+    background = ImageChops.multiply(ImageChops.multiply(red, green), blue)
+    img.paste((255, 255, 255, 0), mask=background)
+    return img
+
+
+@lru_cache(maxsize=None)
+def load_font(font_file, font_size):
+    """載入字體，同一字體與大小只載入一次。"""
+    return ImageFont.truetype(font_file, font_size)
+
+
+@lru_cache(maxsize=None)
+def render_signature(date_text, style='standard'):
+    """
+    產生簽名加日期的透明圖片，結果依 (日期, 樣式) 快取。
+    Returns:
+        Image: 高度為 SIGNATURE_TARGET_HEIGHT 的 RGBA 圖片。
+    """
+    settings = SIGNATURE_STYLES[style]
+    img = load_keyed_signature()
+    font = load_font(SIGNATURE_FONT_FILE, settings['font_size'])
+
+    # 獲取文字尺寸
+    draw = ImageDraw.Draw(img)
+    try:
+        text_bbox = draw.textbbox((0, 0), date_text, font=font)
+        text_width = text_bbox[2] - text_bbox[0]
+        text_height = text_bbox[3] - text_bbox[1]
+    except AttributeError:
+        text_width, text_height = draw.textsize(date_text, font=font)
+
+    # 創建新的透明圖片，貼上處理過的簽名圖片並添加日期文字
+    padding = settings['padding']
+    new_image_width = img.width + text_width + padding
+    new_image_height = max(img.height, text_height)
+    new_img = Image.new('RGBA', (new_image_width, new_image_height), (255, 255, 255, 0))
+    new_img.paste(img, (0, 0), img)
+    draw_new_img = ImageDraw.Draw(new_img)
+    text_y = (new_image_height - text_height) // 2
+    draw_new_img.text((img.width + padding, text_y), date_text, font=font, fill=(0, 0, 0, 255))
+
+    # 縮小整個圖片
+    scale_factor = SIGNATURE_TARGET_HEIGHT / new_img.height
+    target_width = int(new_image_width * scale_factor)
+    return new_img.resize((target_width, SIGNATURE_TARGET_HEIGHT), Image.LANCZOS)
+
+
+@lru_cache(maxsize=None)
+def get_signature_reader(date_text, style='standard'):
+    """返回可直接傳給 reportlab drawImage 的記憶體內圖片，不寫入暫存檔。"""
+    return ImageReader(render_signature(date_text, style))
@@ -1,9 +1,7 @@
 import tkinter as tk
 from tkinter import filedialog, ttk
-from PIL import Image, ImageDraw, ImageFont
 from PyPDF2 import PdfWriter, PdfReader
 from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import A4
 import io
 import os
 import json
@@ -11,7 +9,85 @@ import shutil
 from datetime import datetime
 import threading
 import time
-import re
+import queue
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import lru_cache
+from qc_schema import AS_BUILT_FOLDERS, TARGET_FOLDER_PATTERNS
+from signature_image import get_signature_reader
+
+SIGNATURE_WIDTH = 40  # 簽名圖片在 PDF 中的固定寬度（pt）
+SIGNATURE_HEIGHT = 15  # 簽名圖片在 PDF 中的固定高度（pt）
+SIGNING_WORKERS = os.cpu_count()  # 同時簽名的工作程序數量
+PROGRESS_POLL_MS = 100  # Tk 主迴圈讀取進度佇列的間隔（毫秒）
+
+
+@lru_cache(maxsize=None)
+def get_signature_overlay(doc_type, position, page_size, date_text):
+    """
+    產生簽名覆蓋頁並快取解析後的頁面，同一 (文件類型, 位置, 頁面尺寸, 日期) 只產生一次。
+    reportlab 將圖片寫成 Form XObject，覆蓋頁的內容只是一個置放指令，合併時直接沿用同一份資源。
+    """
+    x, y = position
+    packet = io.BytesIO()
+    can = canvas.Canvas(packet, pagesize=page_size)
+    can.drawImage(get_signature_reader(date_text, 'standard'),
+                  x - SIGNATURE_WIDTH / 2, y - SIGNATURE_HEIGHT / 2, SIGNATURE_WIDTH, SIGNATURE_HEIGHT,
+                  preserveAspectRatio=True, mask='auto')
+    can.save()
+    packet.seek(0)
+    return PdfReader(packet).pages[0]
+
+
+def sign_pdf(input_path, doc_type, position, date_text):
+    """
+    將簽名覆蓋頁合併到 PDF 第一頁並寫入臨時檔案，每個檔案只需合併與寫入。
+    Returns:
+        str: 臨時檔案路徑，由呼叫端在確認後取代原始檔案。
+    """
+    # 創建臨時檔案路徑，使用時間戳來確保唯一性
+    temp_output_path = f"{input_path}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.temp"
+    try:
+        with open(input_path, "rb") as input_stream:
+            existing_pdf = PdfReader(input_stream)
+            output = PdfWriter()
+
+            page = existing_pdf.pages[0]
+            page_size = (float(page.mediabox.width), float(page.mediabox.height))
+            page.merge_page(get_signature_overlay(doc_type, tuple(position), page_size, date_text))
+            output.add_page(page)
+
+            # 如果有多頁，繼續添加
+            for i in range(1, len(existing_pdf.pages)):
+                output.add_page(existing_pdf.pages[i])
+
+            # 寫入臨時檔案
+            with open(temp_output_path, "wb") as output_stream:
+                output.write(output_stream)
+    except Exception:
+        # 如果發生錯誤，嘗試清理臨時檔案
+        if os.path.exists(temp_output_path):
+            try:
+                os.remove(temp_output_path)
+            except OSError:
+                pass
+        raise
+    return temp_output_path
+
+
+def sign_pdf_job(job):
+    """
+    工作程序執行的簽名工作，每個工作程序各自快取簽名圖片與覆蓋頁。
+    Args:
+        job (tuple): (PDF 路徑, 文件類型, 簽名位置, 日期)。
+    Returns:
+        tuple: (PDF 路徑, 臨時檔案路徑, 錯誤訊息)，成功時錯誤訊息為 None，失敗時臨時檔案路徑為 None。
+    """
+    pdf_path, doc_type, position, date_text = job
+    try:
+        return pdf_path, sign_pdf(pdf_path, doc_type, position, date_text), None
+    except Exception as e:
+        return pdf_path, None, str(e)
+
 
 class SignatureTool:
     def __init__(self):
@@ -22,6 +98,9 @@ class SignatureTool:
         self.setup_gui()
         self.pending_files = []  # 儲存待處理的檔案資訊
         self.processing = False
+        self.progress_queue = queue.Queue()  # 背景簽名執行緒放入的進度與結果事件，由 Tk 主迴圈定期讀取
+        self.progress_done = 0
+        self.progress_total = 0
         self.start_file_check_thread()
 
     def load_positions(self):
@@ -93,8 +172,7 @@ class SignatureTool:
         self.result_text.config(yscrollcommand=scrollbar.set)
 
     def is_valid_folder_name(self, folder_name):
-        pattern = r'XB1#\d+|XB[1-4][ABC]#\d+|6S21[1-7]#\d+|6S20[1256]#\d+$'
-        return bool(re.match(pattern, folder_name))
+        return bool(TARGET_FOLDER_PATTERNS['syb'].match(folder_name))
 
     def find_target_pdfs(self, root_folder):
         target_pdfs = []
@@ -102,13 +180,13 @@ class SignatureTool:
         for root, dirs, files in os.walk(root_folder):
             current_folder = os.path.basename(root)
             
-            if current_folder in ["04 Welding Identification Summary", "02 Material Traceability"]:
+            if current_folder in (AS_BUILT_FOLDERS['welding_summary'], AS_BUILT_FOLDERS['material']):
                 parent_folder = os.path.basename(os.path.dirname(root))
                 if self.is_valid_folder_name(parent_folder):
                     for file in files:
                         if file.lower().endswith('.pdf'):
                             pdf_path = os.path.join(root, file)
-                            doc_type = 'Welding' if "Welding" in current_folder else 'Material'
+                            doc_type = 'Welding' if current_folder == AS_BUILT_FOLDERS['welding_summary'] else 'Material'
                             target_pdfs.append((pdf_path, doc_type))
         
         return target_pdfs
@@ -158,125 +236,6 @@ class SignatureTool:
         self.result_text.insert(tk.END, message + "\n")
         self.result_text.see(tk.END)
 
-    def create_signature_image(self):
-        try:
-            date_text = self.date_entry.get()
-            if not date_text:
-                self.status_label.config(text="請輸入日期")
-                return None
-
-            # 開啟原始簽名圖片並轉換為RGBA模式
-            img = Image.open("紹宇.jpg").convert('RGBA')
-            
-            # 將灰色背景轉換為透明
-            data = img.getdata()
-            new_data = []
-            # 設定閾值來決定哪些像素要變透明
-            threshold = 100  # 可以調整這個值來改變透明化的程度
-            
-            for item in data:
-                # 檢查像素是否接近灰色或白色
-                if item[0] > threshold and item[1] > threshold and item[2] > threshold:
-                    new_data.append((255, 255, 255, 0))  # 完全透明
-                else:
-                    new_data.append(item)  # 保持原來的顏色
-                    
-            img.putdata(new_data)
-            
-            # 設定文字和字體
-            font = ImageFont.truetype("JasonHandwriting2-Regular.ttf", 100)
-
-            # 獲取文字尺寸
-            draw = ImageDraw.Draw(img)
-            try:
-                text_bbox = draw.textbbox((0, 0), date_text, font=font)
-                text_width = text_bbox[2] - text_bbox[0]
-                text_height = text_bbox[3] - text_bbox[1]
-            except AttributeError:
-                text_width, text_height = draw.textsize(date_text, font=font)
-
-            # 創建新的透明圖片
-            padding = 20
-            new_image_width = img.width + text_width + padding
-            new_image_height = max(img.height, text_height)
-            new_img = Image.new('RGBA', (new_image_width, new_image_height), (255, 255, 255, 0))  # 完全透明背景
-            
-            # 貼上處理過的簽名圖片
-            new_img.paste(img, (0, 0), img)
-
-            # 添加日期文字到透明背景上
-            draw_new_img = ImageDraw.Draw(new_img)
-            text_y = (new_image_height - text_height) // 2
-            text_position = (img.width + padding, text_y)
-            draw_new_img.text(text_position, date_text, font=font, fill=(0, 0, 0, 255))  # 黑色文字，完全不透明
-
-            # 縮小整個圖片
-            target_height = 50
-            scale_factor = target_height / new_img.height
-            target_width = int(new_image_width * scale_factor)
-            
-            resized_img = new_img.resize((target_width, target_height), Image.LANCZOS)
-
-            temp_path = f"temp_signature_{datetime.now().strftime('%Y%m%d_%H%M%S')}.png"
-            resized_img.save(temp_path, format='PNG')  # 使用PNG格式以保持透明度
-            return temp_path
-
-        except Exception as e:
-            self.status_label.config(text=f"創建簽名圖片時發生錯誤: {e}")
-            return None
-
-    def add_signature_to_pdf(self, input_path, signature_path, x, y):
-        try:
-            # 創建臨時檔案路徑，使用時間戳來確保唯一性
-            temp_output_path = f"{input_path}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.temp"
-            
-            packet = io.BytesIO()
-            can = canvas.Canvas(packet, pagesize=A4)
-            
-            # 使用傳入的位置，並設定固定的大小
-            width = 40
-            height = 15
-            
-            can.drawImage(signature_path, x - width / 2, y - height / 2, width, height, preserveAspectRatio=True, mask='auto')
-            can.save()
-            packet.seek(0)
-            
-            new_pdf = PdfReader(packet)
-            existing_pdf = PdfReader(open(input_path, "rb"))
-            output = PdfWriter()
-            
-            page = existing_pdf.pages[0]
-            page.merge_page(new_pdf.pages[0])
-            output.add_page(page)
-            
-            # 如果有多頁，繼續添加
-            for i in range(1, len(existing_pdf.pages)):
-                output.add_page(existing_pdf.pages[i])
-            
-            # 寫入臨時檔案
-            with open(temp_output_path, "wb") as outputStream:
-                output.write(outputStream)
-            
-            # 將檔案資訊加入待處理列表
-            self.pending_files.append({
-                'temp_path': temp_output_path,
-                'original_path': input_path,
-                'timestamp': time.time()
-            })
-            
-            self.window.after(0, lambda: self.status_label.config(text="檔案處理完成！將在1秒後自動更新原始檔案"))
-            return True
-
-        except Exception as e:
-            self.window.after(0, lambda: self.status_label.config(text=f"處理PDF時發生錯誤: {e}"))
-            # 如果發生錯誤，嘗試清理臨時檔案
-            if os.path.exists(temp_output_path):
-                try:
-                    os.remove(temp_output_path)
-                except:
-                    pass
-            return False
-
     def select_folder(self):
         self.root_folder = filedialog.askdirectory(title="選擇根目錄資料夾")
         if self.root_folder:
@@ -288,26 +247,6 @@ class SignatureTool:
             self.folder_label.config(text="未選擇資料夾")
             self.process_button.config(state=tk.DISABLED)
 
-    def process_pdf_with_position(self, pdf_info):
-        pdf_path, doc_type = pdf_info
-        if not self.positions.get(doc_type):
-            self.append_result(f"跳過 {os.path.basename(pdf_path)}: 未設定簽名位置")
-            return False
-
-        signature_path = self.create_signature_image()
-        if not signature_path:
-            return False
-
-        x, y = self.positions[doc_type]
-        success = self.add_signature_to_pdf(pdf_path, signature_path, x, y)
-        
-        try:
-            os.remove(signature_path)
-        except:
-            pass
-
-        return success
-
     def process_all_pdfs(self):
         if self.processing:
             return
@@ -316,37 +255,88 @@ class SignatureTool:
             self.status_label.config(text="請先選擇根目錄資料夾")
             return
 
+        date_text = self.date_entry.get()
+        if not date_text:
+            self.status_label.config(text="請輸入日期")
+            return
+
         self.processing = True
         self.process_button.config(state=tk.DISABLED)
         self.result_text.delete(1.0, tk.END)
-        
-        def process_thread():
+        self.progress_done = 0
+        self.progress_total = 0
+
+        threading.Thread(target=self.sign_all_pdfs, args=(self.root_folder, date_text), daemon=True).start()
+        self.window.after(PROGRESS_POLL_MS, self.drain_progress_queue)
+
+    def sign_all_pdfs(self, root_folder, date_text):
+        """在背景執行緒中將簽名工作分配到工作程序池，進度與結果放入 progress_queue。"""
+        try:
+            target_pdfs = self.find_target_pdfs(root_folder)
+            if not target_pdfs:
+                self.progress_queue.put(('finished', "未找到符合條件的PDF文件"))
+                return
+
+            self.progress_queue.put(('total', len(target_pdfs)))
+            jobs = []
+            for pdf_path, doc_type in target_pdfs:
+                if self.positions.get(doc_type):
+                    jobs.append((pdf_path, doc_type, tuple(self.positions[doc_type]), date_text))
+                else:
+                    self.progress_queue.put(('skipped', pdf_path, "未設定簽名位置"))
+
+            if jobs:
+                with ProcessPoolExecutor(max_workers=min(SIGNING_WORKERS, len(jobs))) as executor:
+                    futures = [executor.submit(sign_pdf_job, job) for job in jobs]
+                    for future in as_completed(futures):
+                        self.progress_queue.put(('signed',) + future.result())
+
+            self.progress_queue.put(('finished', "所有文件處理完成"))
+        except Exception as e:
+            self.progress_queue.put(('finished', f"處理過程中發生錯誤: {e}"))
+
+    def drain_progress_queue(self):
+        """由 Tk 主迴圈每 PROGRESS_POLL_MS 毫秒呼叫一次，一次處理佇列中累積的所有事件後才更新畫面。"""
+        messages = []
+        finished_message = None
+        while True:
             try:
-                target_pdfs = self.find_target_pdfs(self.root_folder)
-                if not target_pdfs:
-                    self.window.after(0, lambda: self.status_label.config(text="未找到符合條件的PDF文件"))
-                    return
-
-                total = len(target_pdfs)
-                self.window.after(0, lambda: self.progress_bar.configure(maximum=total))
-                
-                for i, pdf_info in enumerate(target_pdfs, 1):
-                    pdf_path = pdf_info[0]
-                    self.window.after(0, lambda p=pdf_path, i=i: self.status_label.config(
-                        text=f"正在處理 {os.path.basename(p)} ({i}/{total})"
-                    ))
-                    self.window.after(0, lambda i=i: self.progress_bar.configure(value=i))
-                    
-                    self.process_pdf_with_position(pdf_info)
-                    
-                self.window.after(0, lambda: self.status_label.config(text="所有文件處理完成"))
-            except Exception as e:
-                self.window.after(0, lambda: self.status_label.config(text=f"處理過程中發生錯誤: {e}"))
-            finally:
-                self.window.after(0, lambda: self.process_button.config(state=tk.NORMAL))
-                self.processing = False
-
-        threading.Thread(target=process_thread, daemon=True).start()
+                event = self.progress_queue.get_nowait()
+            except queue.Empty:
+                break
+            if event[0] == 'total':
+                self.progress_total = event[1]
+                self.progress_bar.configure(maximum=self.progress_total)
+            elif event[0] == 'skipped':
+                _, pdf_path, reason = event
+                self.progress_done += 1
+                messages.append(f"跳過 {os.path.basename(pdf_path)}: {reason}")
+            elif event[0] == 'signed':
+                _, pdf_path, temp_output_path, error = event
+                self.progress_done += 1
+                if error:
+                    messages.append(f"處理PDF時發生錯誤 {os.path.basename(pdf_path)}: {error}")
+                else:
+                    # 將檔案資訊加入待處理列表，1秒後自動更新原始檔案
+                    self.pending_files.append({
+                        'temp_path': temp_output_path,
+                        'original_path': pdf_path,
+                        'timestamp': time.time()
+                    })
+            elif event[0] == 'finished':
+                finished_message = event[1]
+
+        if messages:
+            self.append_result("\n".join(messages))
+        self.progress_bar.configure(value=self.progress_done)
+        if finished_message is not None:
+            self.status_label.config(text=finished_message)
+            self.process_button.config(state=tk.NORMAL)
+            self.processing = False
+        else:
+            if self.progress_total:
+                self.status_label.config(text=f"正在處理 ({self.progress_done}/{self.progress_total})")
+            self.window.after(PROGRESS_POLL_MS, self.drain_progress_queue)
 
     def run(self):
         self.window.mainloop()
@@ -1,6 +1,5 @@
 import tkinter as tk
 from tkinter import filedialog, messagebox
-from PIL import Image, ImageDraw, ImageFont
 from PyPDF2 import PdfWriter, PdfReader
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import A4
@@ -10,8 +9,9 @@ import shutil
 from datetime import datetime
 import threading
 import time
-import re
 import fitz  # PyMuPDF
+from qc_schema import AS_BUILT_FOLDERS, TARGET_FOLDER_PATTERNS
+from signature_image import get_signature_reader
 
 class SignatureTool:
     def __init__(self):
@@ -22,7 +22,7 @@ class SignatureTool:
         self.setup_gui()
         self.pending_files = []
         self.start_file_check_thread()
-        self.signature_path = None
+        self.signature_image = None
 
     def setup_gui(self):
         self.window.geometry("400x450")
@@ -146,64 +146,13 @@ class SignatureTool:
             time.sleep(1)
 
     def create_signature_image(self):
+        """返回目前日期的簽名圖片（記憶體內的 ImageReader，使用較大字體），同一日期只產生一次。"""
         try:
             date_text = self.date_entry.get()
             if not date_text:
                 self.status_label.config(text="請輸入日期")
                 return None
-
-            # 開啟原始簽名圖片並轉換為RGBA模式
-            img = Image.open("紹宇.jpg").convert('RGBA')
-            
-            # 將灰色背景轉換為透明
-            data = img.getdata()
-            new_data = []
-            threshold = 100
-            
-            for item in data:
-                if item[0] > threshold and item[1] > threshold and item[2] > threshold:
-                    new_data.append((255, 255, 255, 0))
-                else:
-                    new_data.append(item)
-            img.putdata(new_data)
-            
-            # 使用較大字體大小以保持清晰度
-            font_size = 200
-            font = ImageFont.truetype("JasonHandwriting2-Regular.ttf", font_size)
-            draw = ImageDraw.Draw(img)
-            
-            try:
-                text_bbox = draw.textbbox((0, 0), date_text, font=font)
-                text_width = text_bbox[2] - text_bbox[0]
-                text_height = text_bbox[3] - text_bbox[1]
-            except AttributeError:
-                text_width, text_height = draw.textsize(date_text, font=font)
-
-            # 使用較大的 padding
-            padding = 40
-            new_image_width = img.width + text_width + padding
-            new_image_height = max(img.height, text_height)
-            new_img = Image.new('RGBA', (new_image_width, new_image_height), (255, 255, 255, 0))
-            new_img.paste(img, (0, 0), img)
-
-            draw_new_img = ImageDraw.Draw(new_img)
-            text_y = (new_image_height - text_height) // 2
-            text_position = (img.width + padding, text_y)
-            draw_new_img.text(text_position, date_text, font=font, fill=(0, 0, 0, 255))
-
-            # 最終輸出使用較大的尺寸
-            target_height = 50  # 增加目標高度確保清晰度
-            scale_factor = target_height / new_img.height
-            target_width = int(new_image_width * scale_factor)
-            
-            resized_img = new_img.resize(
-                (target_width, target_height), 
-                Image.LANCZOS  # 使用高質量的重採樣方法
-            )
-
-            temp_path = f"temp_signature_{datetime.now().strftime('%Y%m%d_%H%M%S')}.png"
-            resized_img.save(temp_path, format='PNG', quality=95, dpi=(300, 300))  # 設定較高的DPI和質量
-            return temp_path
+            return get_signature_reader(date_text, 'large')
 
         except Exception as e:
             self.status_label.config(text=f"創建簽名圖片時發生錯誤: {e}")
@@ -227,7 +176,7 @@ class SignatureTool:
             if 'doc' in locals():
                 doc.close()
 
-    def add_signature_to_pdf(self, input_path, signature_path, offset_y, offset_x=0):
+    def add_signature_to_pdf(self, input_path, signature_image, offset_y, offset_x=0):
         try:
             position = self.find_text_position(input_path)
             if not position:
@@ -252,7 +201,7 @@ class SignatureTool:
             packet = io.BytesIO()
             can = canvas.Canvas(packet, pagesize=A4)
             can.drawImage(
-                signature_path, 
+                signature_image, 
                 x, 
                 y, 
                 width, 
@@ -294,20 +243,19 @@ class SignatureTool:
             self.status_label.config(text="請先選擇資料夾")
             return
 
-        regex_pattern = r'XB1#\d+|XB[1-4][ABC]#\d+|6S21[1-7]#\d+|6S20[12356]#\d+'
-        pattern = re.compile(regex_pattern)
+        pattern = TARGET_FOLDER_PATTERNS['syc']
 
         for root, dirs, files in os.walk(self.selected_folder):
             for dir_name in dirs:
                 if pattern.match(dir_name):
                     full_dir_path = os.path.join(root, dir_name)
-                    target_subfolders = ["04 Welding Identification Summary", "02 Material Traceability"]
+                    target_subfolders = [AS_BUILT_FOLDERS['welding_summary'], AS_BUILT_FOLDERS['material']]
                     
                     for subfolder in target_subfolders:
-                        if subfolder == "04 Welding Identification Summary":
+                        if subfolder == AS_BUILT_FOLDERS['welding_summary']:
                             offset_y = -10
                             offset_x = 50
-                        elif subfolder == "02 Material Traceability":
+                        elif subfolder == AS_BUILT_FOLDERS['material']:
                             offset_y = 3
                             offset_x = 0
 
@@ -317,10 +265,9 @@ class SignatureTool:
                             
                             for pdf_file in pdf_files:
                                 pdf_path = os.path.join(subfolder_path, pdf_file)
-                                self.signature_path = self.create_signature_image()
-                                if self.signature_path:
-                                    self.add_signature_to_pdf(pdf_path, self.signature_path, offset_y, offset_x)
-                                    os.remove(self.signature_path)
+                                self.signature_image = self.create_signature_image()
+                                if self.signature_image:
+                                    self.add_signature_to_pdf(pdf_path, self.signature_image, offset_y, offset_x)
                                 else:
                                     self.status_label.config(text="簽名圖像生成失敗，跳過此文件")
 
@@ -331,23 +278,22 @@ class SignatureTool:
             self.status_label.config(text="請先選擇檔案")
             return
 
-        signature_path = self.create_signature_image()
-        if signature_path:
+        signature_image = self.create_signature_image()
+        if signature_image:
             # 根據檔案路徑判斷是否屬於特定子資料夾，以使用對應的偏移值
             offset_y = 0
             offset_x = 0
-            if "04 Welding Identification Summary" in self.selected_file:
+            if AS_BUILT_FOLDERS['welding_summary'] in self.selected_file:
                 offset_y = -10
                 offset_x = 50
-            elif "02 Material Traceability" in self.selected_file:
+            elif AS_BUILT_FOLDERS['material'] in self.selected_file:
                 offset_y = 3
                 offset_x = 0
 
-            if self.add_signature_to_pdf(self.selected_file, signature_path, offset_y, offset_x):
+            if self.add_signature_to_pdf(self.selected_file, signature_image, offset_y, offset_x):
                 self.status_label.config(text=f"檔案已成功更新: {os.path.basename(self.selected_file)}")
             else:
                 self.status_label.config(text=f"處理檔案失敗: {os.path.basename(self.selected_file)}")
-            os.remove(signature_path)
         else:
             self.status_label.config(text="簽名圖像生成失敗，跳過此文件")
 